@@ -3,7 +3,7 @@ AI client for OpenAI and OpenRouter integration
 """
 import os
 import json
-import base64
+import binascii
 import time
 from typing import Optional, Dict, Any, Tuple
 import sys
@@ -48,7 +48,8 @@ class AIClient:
     
     def _encode_image(self, image_bytes: bytes) -> str:
         """Encode image bytes to base64"""
-        return base64.b64encode(image_bytes).decode('utf-8')
+        # binascii is the C routine base64.b64encode wraps; skip the wrapper
+        return binascii.b2a_base64(image_bytes, newline=False).decode('ascii')
     
     def _call_openai(self, image_bytes: bytes, prompt: str) -> Optional[Dict[str, Any]]:
         """Call OpenAI Vision API"""
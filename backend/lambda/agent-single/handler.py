@@ -22,7 +22,7 @@ if os.path.isdir(LAYER_SITE) and LAYER_SITE not in sys.path:
 from shared.s3 import download_image, upload_file_to_s3  # type: ignore
 from shared.dynamodb import get_metadata, put_metadata  # type: ignore
 from shared.models import PhotoMetadata  # type: ignore
-from shared.image_utils import bbox_to_grid_coords, validate_image  # type: ignore
+from shared.image_utils import bbox_to_grid_coords_batch, validate_image  # type: ignore
 from shared.cv_utils import (
     annotate_damage_with_ai,
     generate_overlay,
@@ -30,6 +30,7 @@ from shared.cv_utils import (
     filter_large_damage_areas,
     detect_damage_with_gpt,
     merge_damage_areas,
+    get_decoded_image,
 )  # type: ignore
 from shared.single_agent import (
     run_yolo_inference,
@@ -244,17 +245,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         ai_client = AIClient()
 
+        # Decode once for YOLO and the CV detectors
+        decoded = get_decoded_image(image_bytes)
+
         yolo_detections = run_yolo_inference(
             image_bytes,
             session=session,
             class_names=class_names,
             conf_threshold=float(os.environ.get("YOLO_CONF_THRESHOLD", "0.3")),
             iou_threshold=float(os.environ.get("YOLO_IOU_THRESHOLD", "0.45")),
+            cache_key=f"s3://{model_bucket}/{model_key}",
+            decoded=decoded,
         )
         print(f"[SingleAgent] YOLO detections: {len(yolo_detections)}")
 
         # Merge with CV heuristics
-        damage_areas = enrich_with_cv(image_bytes, yolo_detections)
+        damage_areas = enrich_with_cv(image_bytes, yolo_detections, decoded=decoded)
         print(f"[SingleAgent] After CV merge: {len(damage_areas)} detections")
 
         # GPT-4 Vision detection (most accurate, finds what YOLO/CV miss)
@@ -292,10 +298,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         damage_areas = filter_large_damage_areas(damage_areas, image_width, image_height)
 
         # Add grid coordinates for easier UI mapping
-        for area in damage_areas:
-            bbox = area.get("bbox")
-            if bbox and len(bbox) == 4:
-                area["grid_coords"] = bbox_to_grid_coords(bbox, image_width, image_height)
+        gridded = [area for area in damage_areas if area.get("bbox") and len(area["bbox"]) == 4]
+        if gridded:
+            cells = bbox_to_grid_coords_batch(
+                [area["bbox"] for area in gridded], image_width, image_height
+            ).tolist()
+            for area, (row, col) in zip(gridded, cells):
+                area["grid_coords"] = {"row": row, "col": col}
 
         counts = count_damage_instances(damage_areas)
 
@@ -310,6 +319,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             damage_areas,
             damage_types=[area.get("damage_type", "unknown") for area in damage_areas],
             counts=counts,
+            image_format="PNG8",
         )
         timestamp = int(time.time())
         overlay_key = f"{overlay_prefix}/{photo_id}-{timestamp}.png"
@@ -1,9 +1,14 @@
 """
 Computer vision utilities for image processing and analysis
 """
+import hashlib
 import io
 import json
-from typing import List, Dict, Any, Tuple, Optional
+import os
+import threading
+from collections import Counter, OrderedDict
+from functools import cached_property, wraps
+from typing import List, Dict, Any, Callable, Tuple, Optional, Sequence, Union
 try:
     import numpy as np  # type: ignore
 except ImportError:  # pragma: no cover
@@ -13,12 +18,97 @@ try:
     import cv2  # type: ignore
 except ImportError:  # pragma: no cover
     cv2 = None
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
 
 # AIClient will be passed as parameter to functions that need it
 # This avoids circular imports since ai_client is in lambda directories
 AIClient = None  # Type hint, actual client passed at runtime
 
 
+def _cv_thread_count() -> int:
+    """
+    Pick the OpenCV worker thread count for this container.
+
+    CV_THREADS wins when set. Otherwise derive it from the Lambda memory size
+    (Lambda grants one vCPU per 1769 MB): below that there is a single core and
+    extra threads only add contention on these small images.
+    """
+    override = os.environ.get("CV_THREADS")
+    if override:
+        try:
+            return max(1, int(override))
+        except ValueError:
+            print(f"[CV] Ignoring invalid CV_THREADS={override!r}")
+    try:
+        memory_mb = int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "0"))
+    except ValueError:
+        memory_mb = 0
+    if memory_mb <= 0:
+        # Not on Lambda: keep OpenCV's own default
+        return -1
+    return max(1, memory_mb // 1769)
+
+
+if cv2 is not None:
+    cv2.setUseOptimized(True)
+    _CV_THREADS = _cv_thread_count()
+    if _CV_THREADS > 0:
+        cv2.setNumThreads(_CV_THREADS)
+
+_REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+} if cv2 is not None else {}
+
+# Morphology kernels shared by the detectors
+_RECT5 = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5)) if cv2 is not None else None
+_RECT7 = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7)) if cv2 is not None else None
+_RECT9 = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9)) if cv2 is not None else None
+
+# CLAHE carries internal LUT state and is not safe to share between threads;
+# each thread builds one and reuses it across calls
+_clahe_local = threading.local()
+
+
+def _clahe() -> Any:
+    """Return this thread's CLAHE (clip limit 2.0, 8x8 tiles)."""
+    clahe = getattr(_clahe_local, "clahe", None)
+    if clahe is None:
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        _clahe_local.clahe = clahe
+    return clahe
+
+
+# Overlay fill colors (RGBA) per damage type
+_DAMAGE_COLORS: Dict[str, Tuple[int, int, int, int]] = {
+    "missing_shingles": (255, 0, 0, 128),      # Red
+    "cracks": (255, 165, 0, 128),               # Orange
+    "hail_impact": (255, 255, 0, 128),         # Yellow
+    "water_stains": (0, 0, 255, 128),          # Blue
+    "sagging": (128, 0, 128, 128),            # Purple
+    "discoloration": (0, 255, 255, 128),      # Cyan
+    "unknown": (128, 128, 128, 128)           # Gray
+}
+
+
+def _load_label_font() -> Any:
+    """Load the overlay label font once; arial is absent on Lambda, DejaVu usually is."""
+    for name in ("DejaVuSans.ttf", "arial.ttf"):
+        try:
+            return ImageFont.truetype(name, 12)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+_LABEL_FONT = _load_label_font()
+
+
 def _ensure_cv2_available() -> None:
     """Ensure cv2 is available before running CV-heavy routines."""
     if cv2 is None:
@@ -35,18 +125,276 @@ def _ensure_numpy_available() -> None:
         )
 
 
-def _clamp_bbox(bbox: List[int], width: int, height: int) -> List[int]:
-    """Clamp a bounding box to stay within image boundaries."""
-    x1, y1, x2, y2 = bbox
-    x1 = max(0, min(width - 1, x1))
-    y1 = max(0, min(height - 1, y1))
-    x2 = max(0, min(width, x2))
-    y2 = max(0, min(height, y2))
-    if x2 <= x1:
-        x2 = x1 + 1
-    if y2 <= y1:
-        y2 = y1 + 1
-    return [x1, y1, x2, y2]
+def _decode_bgr(image_bytes: bytes, reduce_factor: int = 1) -> Optional["np.ndarray"]:
+    """
+    Decode encoded image bytes into a BGR array (None if undecodable).
+
+    reduce_factor of 2, 4 or 8 decodes at that fraction of the size; JPEG
+    scales in the DCT so the decode itself gets cheaper too.
+    """
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, _REDUCED_DECODE_FLAGS.get(reduce_factor, cv2.IMREAD_COLOR))
+
+
+def _detection_max_edge() -> int:
+    """Longest edge the CV detectors work at (CV_MAX_EDGE, 0 disables reduction)."""
+    try:
+        return int(os.environ.get("CV_MAX_EDGE", "2048"))
+    except ValueError:
+        return 2048
+
+
+def _enhance_jpeg_quality() -> int:
+    """JPEG quality for enhance_colors (ENHANCE_JPEG_Q, clamped to 1-100; default 85)."""
+    try:
+        quality = int(os.environ.get("ENHANCE_JPEG_Q", "85"))
+    except ValueError:
+        return 85
+    return min(100, max(1, quality))
+
+
+def _choose_reduce_factor(image_bytes: bytes, max_edge: int) -> Tuple[int, Optional[Tuple[int, int]]]:
+    """
+    Pick the decode reduction for an image from its header alone.
+
+    Returns:
+        Tuple of (factor, (width, height) from the header or None if unreadable)
+    """
+    try:
+        size = Image.open(io.BytesIO(image_bytes)).size
+    except Exception:
+        return 1, None
+    longest = max(size)
+    if max_edge <= 0 or longest <= max_edge:
+        return 1, size
+    for factor in (2, 4):
+        if -(-longest // factor) <= max_edge:
+            return factor, size
+    return 8, size
+
+
+def _readonly(array: "np.ndarray") -> "np.ndarray":
+    """Mark a shared array read-only so detectors cannot corrupt it for each other."""
+    array.flags.writeable = False
+    return array
+
+
+class DecodedImage:
+    """
+    A decoded image shared across CV detectors.
+
+    The BGR array is decoded once and each color space is converted lazily on
+    first access, so running several detectors on the same photo pays for one
+    decode and one conversion per color space. All arrays are read-only.
+    """
+
+    def __init__(self,
+                 bgr: Optional["np.ndarray"],
+                 scale: int = 1,
+                 original_size: Optional[Tuple[int, int]] = None):
+        self._bgr = _readonly(bgr) if bgr is not None else None
+        self._blurred: Dict[Tuple[str, int], "np.ndarray"] = {}
+        # Per-image results of later pipeline stages (e.g. single_agent's roof
+        # mask), stored here so every stage working on this image reuses them
+        self.derived: Dict[str, Any] = {}
+        # (content digest, max_edge) when created by get_decoded_image
+        self.cache_key: Optional[Tuple[bytes, int]] = None
+        # Original pixels per decoded pixel, and the (width, height) bboxes map back to
+        self.scale = scale
+        if original_size is None and bgr is not None:
+            original_size = (bgr.shape[1] * scale, bgr.shape[0] * scale)
+        self.original_size = original_size
+
+    @classmethod
+    def from_bytes(cls, image_bytes: bytes, max_edge: Optional[int] = None) -> "DecodedImage":
+        """
+        Decode encoded image bytes (the result is empty if undecodable).
+
+        Images whose longest edge exceeds max_edge (default CV_MAX_EDGE) are
+        decoded at 1/2, 1/4 or 1/8 size; scale records the factor.
+        """
+        if max_edge is None:
+            max_edge = _detection_max_edge()
+        factor, header_size = _choose_reduce_factor(image_bytes, max_edge)
+        bgr = _decode_bgr(image_bytes, factor)
+        if bgr is None or factor == 1:
+            return cls(bgr)
+
+        original_size = header_size
+        decoded_h, decoded_w = bgr.shape[:2]
+        if (decoded_w > decoded_h) != (header_size[0] > header_size[1]):
+            # EXIF orientation rotated the pixels relative to the header
+            original_size = (header_size[1], header_size[0])
+        return cls(bgr, scale=factor, original_size=original_size)
+
+    @property
+    def is_empty(self) -> bool:
+        return self._bgr is None
+
+    def to_original_bboxes(self, rects: "np.ndarray") -> "np.ndarray":
+        """Map (N, 4) decoded-pixel [x, y, w, h] rects to clamped [x1, y1, x2, y2] in original pixels."""
+        width, height = self.original_size
+        boxes = np.empty_like(rects)
+        boxes[:, :2] = rects[:, :2]
+        boxes[:, 2:] = rects[:, :2] + rects[:, 2:]
+        return _clamp_bboxes(boxes * self.scale, width, height)
+
+    @property
+    def bgr(self) -> "np.ndarray":
+        return self._bgr
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self._bgr.shape
+
+    @cached_property
+    def hsv(self) -> "np.ndarray":
+        return _readonly(cv2.cvtColor(self._bgr, cv2.COLOR_BGR2HSV))
+
+    @cached_property
+    def lab(self) -> "np.ndarray":
+        return _readonly(cv2.cvtColor(self._bgr, cv2.COLOR_BGR2LAB))
+
+    @cached_property
+    def gray(self) -> "np.ndarray":
+        return _readonly(cv2.cvtColor(self._bgr, cv2.COLOR_BGR2GRAY))
+
+    @cached_property
+    def l_channel(self) -> "np.ndarray":
+        return _readonly(cv2.extractChannel(self.lab, 0))
+
+    @cached_property
+    def a_channel(self) -> "np.ndarray":
+        return _readonly(cv2.extractChannel(self.lab, 1))
+
+    def blurred(self, plane: str, ksize: int) -> "np.ndarray":
+        """
+        Gaussian blur (sigma from ksize) of a plane such as "gray" or "l_channel",
+        computed once per plane and kernel size.
+        """
+        key = (plane, ksize)
+        result = self._blurred.get(key)
+        if result is None:
+            result = _readonly(cv2.GaussianBlur(getattr(self, plane), (ksize, ksize), 0))
+            self._blurred[key] = result
+        return result
+
+
+# Recently decoded images keyed by content digest; small because each entry
+# holds several full-resolution planes
+_DECODED_CACHE: "OrderedDict[Tuple[bytes, int], DecodedImage]" = OrderedDict()
+_DECODED_CACHE_SIZE = 2
+
+
+def get_decoded_image(image_bytes: bytes, max_edge: Optional[int] = None) -> DecodedImage:
+    """
+    Return the shared DecodedImage for image_bytes, decoding it at most once.
+
+    Args:
+        image_bytes: Encoded image bytes
+        max_edge: Longest edge to decode at (default CV_MAX_EDGE, 0 for full size)
+
+    Returns:
+        DecodedImage (check is_empty for undecodable input)
+    """
+    _ensure_cv2_available()
+    _ensure_numpy_available()
+    return _get_decoded_by_key(image_bytes, _content_key(image_bytes, max_edge))
+
+
+def _content_key(image_bytes: bytes, max_edge: Optional[int] = None) -> Tuple[bytes, int]:
+    """Cache key for image bytes decoded at a given max edge."""
+    if max_edge is None:
+        max_edge = _detection_max_edge()
+    return hashlib.blake2b(image_bytes, digest_size=16).digest(), max_edge
+
+
+def _get_decoded_by_key(image_bytes: bytes, key: Tuple[bytes, int]) -> DecodedImage:
+    decoded = _DECODED_CACHE.get(key)
+    if decoded is not None:
+        _DECODED_CACHE.move_to_end(key)
+        return decoded
+
+    decoded = DecodedImage.from_bytes(image_bytes, max_edge=key[1])
+    decoded.cache_key = key
+    _DECODED_CACHE[key] = decoded
+    while len(_DECODED_CACHE) > _DECODED_CACHE_SIZE:
+        _DECODED_CACHE.popitem(last=False)
+    return decoded
+
+
+def _as_decoded(image: Union[bytes, DecodedImage]) -> DecodedImage:
+    """Accept either encoded bytes or an already decoded image."""
+    if isinstance(image, DecodedImage):
+        return image
+    return get_decoded_image(image)
+
+
+# Recent CV detector results keyed by (detector, image key, arguments)
+_DETECTION_CACHE: "OrderedDict[Tuple[Any, ...], List[Dict[str, Any]]]" = OrderedDict()
+_DETECTION_CACHE_SIZE = 32
+
+
+def _copy_detections(detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fresh dicts and bbox lists, since callers (e.g. merge_damage_areas) mutate them."""
+    return [dict(det, bbox=list(det["bbox"])) for det in detections]
+
+
+def _memoize_detections(func: Callable[..., List[Dict[str, Any]]]) -> Callable[..., List[Dict[str, Any]]]:
+    """
+    Cache a CV detector's results on the image content, so repeated runs over
+    the same photo (within or across warm invocations) skip decode and compute.
+    Every call returns its own copy of the detections.
+    """
+    @wraps(func)
+    def wrapper(image: Union[bytes, DecodedImage], *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        if isinstance(image, DecodedImage):
+            image_key = image.cache_key
+            if image_key is None:
+                return func(image, *args, **kwargs)
+        else:
+            _ensure_cv2_available()
+            _ensure_numpy_available()
+            image_key = _content_key(image)
+
+        key = (func.__name__, image_key, args, tuple(sorted(kwargs.items())))
+        detections = _DETECTION_CACHE.get(key)
+        if detections is not None:
+            _DETECTION_CACHE.move_to_end(key)
+        else:
+            if not isinstance(image, DecodedImage):
+                image = _get_decoded_by_key(image, image_key)
+            detections = func(image, *args, **kwargs)
+            _DETECTION_CACHE[key] = detections
+            while len(_DETECTION_CACHE) > _DETECTION_CACHE_SIZE:
+                _DETECTION_CACHE.popitem(last=False)
+        return _copy_detections(detections)
+
+    return wrapper
+
+
+def _clamp_bboxes(boxes: "np.ndarray", width: int, height: int) -> "np.ndarray":
+    """Clamp (N, 4) [x1, y1, x2, y2] boxes to stay within image boundaries."""
+    x1 = np.clip(boxes[:, 0], 0, width - 1)
+    y1 = np.clip(boxes[:, 1], 0, height - 1)
+    x2 = np.clip(boxes[:, 2], 0, width)
+    y2 = np.clip(boxes[:, 3], 0, height)
+    x2 = np.where(x2 <= x1, x1 + 1, x2)
+    y2 = np.where(y2 <= y1, y1 + 1, y2)
+    return np.stack([x1, y1, x2, y2], axis=1)
+
+
+def _contour_boxes(contours: Sequence["np.ndarray"], min_area: float) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Bounding rects and areas of the contours at least min_area in size.
+
+    Returns:
+        Tuple of (N, 4) int [x, y, w, h] rects and (N,) float areas, in contour order
+    """
+    areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours))
+    keep = np.flatnonzero(areas >= min_area)
+    rects = np.array([cv2.boundingRect(contours[i]) for i in keep], dtype=np.int64).reshape(-1, 4)
+    return rects, areas[keep]
 
 
 def _chunk_damage_areas(damage_areas: List[Dict[str, Any]], size: int = 5) -> List[List[Dict[str, Any]]]:
@@ -54,24 +402,32 @@ def _chunk_damage_areas(damage_areas: List[Dict[str, Any]], size: int = 5) -> Li
     return [damage_areas[i:i + size] for i in range(0, len(damage_areas), size)]
 
 
-def detect_missing_shingles_cv(image_bytes: bytes, min_area: int = 400) -> List[Dict[str, Any]]:
+@_memoize_detections
+def detect_missing_shingles_cv(image: Union[bytes, DecodedImage], min_area: int = 400) -> List[Dict[str, Any]]:
     """
     Detect missing or mismatched shingles using classical CV routines.
     """
     _ensure_cv2_available()
     _ensure_numpy_available()
 
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    decoded = _as_decoded(image)
+    if decoded.is_empty:
         return []
 
-    height, width = img.shape[:2]
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l_channel, _, _ = cv2.split(lab)
-
-    blur = cv2.GaussianBlur(l_channel, (5, 5), 0)
-    median = cv2.medianBlur(l_channel, 21)
+    height, width = decoded.shape[:2]
+    # min_area is in original pixels; contours are measured on the decoded image
+    min_area_px = min_area / decoded.scale ** 2
+    l_channel = decoded.l_channel
+
+    blur = decoded.blurred("l_channel", 5)
+    # Background reference: a 21px median at full size is the slowest step here,
+    # so take an 11px median at half resolution and upsample (same low-pass field)
+    small = cv2.resize(l_channel, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+    median = cv2.resize(
+        cv2.medianBlur(small, 11),
+        (width, height),
+        interpolation=cv2.INTER_LINEAR,
+    )
     diff = cv2.absdiff(blur, median)
     if diff.max() > 0:
         _, diff_mask = cv2.threshold(diff, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
@@ -80,44 +436,41 @@ def detect_missing_shingles_cv(image_bytes: bytes, min_area: int = 400) -> List[
 
     edges = cv2.Canny(blur, 40, 120)
 
-    color_blur = cv2.GaussianBlur(img, (9, 9), 0)
-    color_diff = cv2.absdiff(img, color_blur)
-    color_gray = cv2.cvtColor(color_diff, cv2.COLOR_BGR2GRAY)
+    # Single-channel high-pass; matches the old per-channel BGR version closely
+    gray_blur = decoded.blurred("gray", 9)
+    color_gray = cv2.absdiff(decoded.gray, gray_blur)
     _, color_mask = cv2.threshold(color_gray, 15, 255, cv2.THRESH_BINARY)
 
-    combined = cv2.bitwise_or(diff_mask, edges)
-    combined = cv2.bitwise_or(combined, color_mask)
+    # OR the three masks into diff_mask's buffer rather than allocating two more
+    combined = cv2.bitwise_or(diff_mask, edges, dst=diff_mask)
+    cv2.bitwise_or(combined, color_mask, dst=combined)
 
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+    kernel = _RECT7
     combined = cv2.morphologyEx(combined, cv2.MORPH_CLOSE, kernel, iterations=2)
     combined = cv2.morphologyEx(combined, cv2.MORPH_OPEN, kernel, iterations=1)
 
     contours, _ = cv2.findContours(combined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    results: List[Dict[str, Any]] = []
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area < min_area:
-            continue
-
-        x, y, w, h = cv2.boundingRect(contour)
-        # Aspect ratio filter removed to improve recall (can be re-enabled if needed)
-        # aspect_ratio = w / float(h) if h > 0 else 0
-        # if aspect_ratio < 0.6 or aspect_ratio > 6:
-        #     continue
-
-        bbox = _clamp_bbox([x, y, x + w, y + h], width, height)
-        confidence = float(min(0.95, 0.4 + (area / (width * height)) * 3))
-        results.append({
+    rects, areas = _contour_boxes(contours, min_area_px)
+    # Aspect ratio filter removed to improve recall (can be re-enabled if needed)
+    # aspect_ratio = w / float(h) if h > 0 else 0
+    # if aspect_ratio < 0.6 or aspect_ratio > 6:
+    #     continue
+
+    bboxes = decoded.to_original_bboxes(rects)
+    confidences = np.minimum(0.95, 0.4 + (areas / (width * height)) * 3)
+    return [
+        {
             "bbox": bbox,
             "confidence": confidence,
             "damage_type": "missing_shingles",
             "source": "cv"
-        })
-
-    return results
+        }
+        for bbox, confidence in zip(bboxes.tolist(), confidences.tolist())
+    ]
 
 
-def detect_exposed_underlayment_cv(image_bytes: bytes, min_area: int = 300) -> List[Dict[str, Any]]:
+@_memoize_detections
+def detect_exposed_underlayment_cv(image: Union[bytes, DecodedImage], min_area: int = 300) -> List[Dict[str, Any]]:
     """
     Detect exposed underlayment (tan/brown patches) which indicate missing shingles.
     Uses HSV color range detection for tan/brown/beige colors.
@@ -125,64 +478,52 @@ def detect_exposed_underlayment_cv(image_bytes: bytes, min_area: int = 300) -> L
     _ensure_cv2_available()
     _ensure_numpy_available()
 
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    decoded = _as_decoded(image)
+    if decoded.is_empty:
         return []
 
-    height, width = img.shape[:2]
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    height, width = decoded.shape[:2]
+    min_area_px = min_area / decoded.scale ** 2
+    hsv = decoded.hsv
 
-    # Tan/brown/beige color ranges (exposed underlayment, plywood, tar paper)
+    # Tan/brown/beige color ranges (exposed underlayment, plywood, tar paper),
+    # OR-ed into one mask with a single scratch buffer instead of five allocations
     # Range 1: Light tan/beige
-    lower_tan1 = np.array([10, 30, 100])
-    upper_tan1 = np.array([25, 150, 230])
-    mask1 = cv2.inRange(hsv, lower_tan1, upper_tan1)
+    mask = cv2.inRange(hsv, (10, 30, 100), (25, 150, 230))
 
     # Range 2: Darker brown/tan
-    lower_tan2 = np.array([8, 50, 80])
-    upper_tan2 = np.array([20, 180, 200])
-    mask2 = cv2.inRange(hsv, lower_tan2, upper_tan2)
+    scratch = cv2.inRange(hsv, (8, 50, 80), (20, 180, 200))
+    cv2.bitwise_or(mask, scratch, dst=mask)
 
     # Range 3: Orange-ish brown (rusted/weathered)
-    lower_orange = np.array([5, 80, 100])
-    upper_orange = np.array([15, 200, 220])
-    mask3 = cv2.inRange(hsv, lower_orange, upper_orange)
-
-    # Combine all masks
-    mask = cv2.bitwise_or(mask1, mask2)
-    mask = cv2.bitwise_or(mask, mask3)
+    cv2.inRange(hsv, (5, 80, 100), (15, 200, 220), dst=scratch)
+    cv2.bitwise_or(mask, scratch, dst=mask)
 
     # Morphological operations to clean up
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+    kernel = _RECT7
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
 
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    results: List[Dict[str, Any]] = []
-
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area < min_area:
-            continue
-
-        x, y, w, h = cv2.boundingRect(contour)
-        bbox = _clamp_bbox([x, y, x + w, y + h], width, height)
+    rects, areas = _contour_boxes(contours, min_area_px)
+    bboxes = decoded.to_original_bboxes(rects)
 
-        # Higher confidence for larger patches (more likely real damage)
-        confidence = float(min(0.92, 0.5 + (area / (width * height)) * 8))
+    # Higher confidence for larger patches (more likely real damage)
+    confidences = np.minimum(0.92, 0.5 + (areas / (width * height)) * 8)
 
-        results.append({
+    return [
+        {
             "bbox": bbox,
             "confidence": confidence,
             "damage_type": "exposed_underlayment",
             "source": "cv_color"
-        })
+        }
+        for bbox, confidence in zip(bboxes.tolist(), confidences.tolist())
+    ]
 
-    return results
 
-
-def detect_dark_patches_cv(image_bytes: bytes, min_area: int = 250) -> List[Dict[str, Any]]:
+@_memoize_detections
+def detect_dark_patches_cv(image: Union[bytes, DecodedImage], min_area: int = 250) -> List[Dict[str, Any]]:
     """
     Detect dark patches (black/dark gray exposed areas) which indicate missing shingles
     or exposed tar paper/dark underlayment. Very common damage pattern.
@@ -190,14 +531,14 @@ def detect_dark_patches_cv(image_bytes: bytes, min_area: int = 250) -> List[Dict
     _ensure_cv2_available()
     _ensure_numpy_available()
 
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    decoded = _as_decoded(image)
+    if decoded.is_empty:
         return []
 
-    height, width = img.shape[:2]
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    height, width = decoded.shape[:2]
+    min_area_px = min_area / decoded.scale ** 2
+    hsv = decoded.hsv
+    gray = decoded.gray
 
     # Calculate image statistics to adapt thresholds
     mean_brightness = np.mean(gray)
@@ -217,7 +558,7 @@ def detect_dark_patches_cv(image_bytes: bytes, min_area: int = 250) -> List[Dict
     mask_gray = cv2.inRange(hsv, lower_dark2, upper_dark2)
 
     # Combine masks
-    mask = cv2.bitwise_or(mask_dark, mask_gray)
+    mask = cv2.bitwise_or(mask_dark, mask_gray, dst=mask_dark)
 
     # Use adaptive thresholding on grayscale to find locally dark regions
     # This helps find dark patches relative to surrounding shingles
@@ -226,11 +567,11 @@ def detect_dark_patches_cv(image_bytes: bytes, min_area: int = 250) -> List[Dict
     )
     
     # Combine with color-based detection
-    mask = cv2.bitwise_or(mask, adaptive_dark)
+    cv2.bitwise_or(mask, adaptive_dark, dst=mask)
 
     # Morphological operations to clean up and connect nearby dark regions
-    kernel_small = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
-    kernel_large = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+    kernel_small = _RECT5
+    kernel_large = _RECT9
     
     # Close gaps between nearby dark patches
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel_large, iterations=2)
@@ -238,41 +579,33 @@ def detect_dark_patches_cv(image_bytes: bytes, min_area: int = 250) -> List[Dict
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel_small, iterations=1)
 
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    results: List[Dict[str, Any]] = []
-
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area < min_area:
-            continue
-
-        x, y, w, h = cv2.boundingRect(contour)
-        
-        # Filter out very thin or very wide detections (likely edges, not gaps)
-        aspect_ratio = w / float(h) if h > 0 else 0
-        if aspect_ratio < 0.15 or aspect_ratio > 8:
-            continue
-
-        bbox = _clamp_bbox([x, y, x + w, y + h], width, height)
-
-        # Calculate how dark this region actually is
-        roi = gray[y:y+h, x:x+w]
-        if roi.size > 0:
-            region_darkness = 1.0 - (np.mean(roi) / 255.0)
-        else:
-            region_darkness = 0.5
-
-        # Confidence based on size and darkness
-        size_factor = min(1.0, (area / (width * height)) * 15)
-        confidence = float(min(0.88, 0.45 + (size_factor * 0.25) + (region_darkness * 0.2)))
-
-        results.append({
+    rects, areas = _contour_boxes(contours, min_area_px)
+
+    # Filter out very thin or very wide detections (likely edges, not gaps)
+    aspect_ratio = np.divide(rects[:, 2], rects[:, 3], out=np.zeros(len(rects)), where=rects[:, 3] > 0)
+    keep = (aspect_ratio >= 0.15) & (aspect_ratio <= 8)
+    rects, areas = rects[keep], areas[keep]
+
+    # Calculate how dark each region actually is
+    region_darkness = np.array([
+        1.0 - (np.mean(gray[y:y+h, x:x+w]) / 255.0) if w > 0 and h > 0 else 0.5
+        for x, y, w, h in rects.tolist()
+    ], dtype=np.float64)
+
+    # Confidence based on size and darkness
+    size_factor = np.minimum(1.0, (areas / (width * height)) * 15)
+    confidences = np.minimum(0.88, 0.45 + (size_factor * 0.25) + (region_darkness * 0.2))
+    bboxes = decoded.to_original_bboxes(rects)
+
+    return [
+        {
             "bbox": bbox,
             "confidence": confidence,
             "damage_type": "missing_shingles",
             "source": "cv_dark_patch"
-        })
-
-    return results
+        }
+        for bbox, confidence in zip(bboxes.tolist(), confidences.tolist())
+    ]
 
 
 def detect_damage_with_gpt(
@@ -400,88 +733,99 @@ If no damage is found, return: {{"detections": []}}"""
         return []
 
 
-def detect_discoloration_cv(image_bytes: bytes, min_area: int = 600) -> List[Dict[str, Any]]:
+@_memoize_detections
+def detect_discoloration_cv(image: Union[bytes, DecodedImage], min_area: int = 600) -> List[Dict[str, Any]]:
     """Detect discoloration or staining using LAB color analysis."""
     _ensure_cv2_available()
     _ensure_numpy_available()
 
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    decoded = _as_decoded(image)
+    if decoded.is_empty:
         return []
 
-    height, width = img.shape[:2]
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l_channel, a_channel, _ = cv2.split(lab)
+    height, width = decoded.shape[:2]
+    min_area_px = min_area / decoded.scale ** 2
+    l_channel = decoded.l_channel
+    a_channel = decoded.a_channel
 
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l_enhanced = clahe.apply(l_channel)
+    l_enhanced = _clahe().apply(l_channel)
 
     blur = cv2.GaussianBlur(l_enhanced, (7, 7), 0)
     adaptive = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
                                      cv2.THRESH_BINARY_INV, 33, 5)
 
-    texture = cv2.Laplacian(a_channel, cv2.CV_64F)
+    # CV_16S holds the uint8 Laplacian exactly at a quarter of CV_64F's bytes
+    texture = cv2.Laplacian(a_channel, cv2.CV_16S)
     texture = cv2.convertScaleAbs(texture)
     _, texture_mask = cv2.threshold(texture, 10, 255, cv2.THRESH_BINARY)
 
-    mask = cv2.bitwise_or(adaptive, texture_mask)
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+    mask = cv2.bitwise_or(adaptive, texture_mask, dst=adaptive)
+    kernel = _RECT9
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
 
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    results: List[Dict[str, Any]] = []
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area < min_area:
-            continue
-        x, y, w, h = cv2.boundingRect(contour)
-        bbox = _clamp_bbox([x, y, x + w, y + h], width, height)
-        confidence = float(min(0.9, 0.3 + (area / (width * height)) * 4))
-        results.append({
+    rects, areas = _contour_boxes(contours, min_area_px)
+    bboxes = decoded.to_original_bboxes(rects)
+    confidences = np.minimum(0.9, 0.3 + (areas / (width * height)) * 4)
+    return [
+        {
             "bbox": bbox,
             "confidence": confidence,
             "damage_type": "discoloration",
             "discoloration_severity": min(1.0, 0.4 + confidence),
             "source": "cv"
-        })
-    return results
-
+        }
+        for bbox, confidence in zip(bboxes.tolist(), confidences.tolist())
+    ]
 
-def annotate_damage_with_ai(image_bytes: bytes,
-                            damage_areas: List[Dict[str, Any]],
-                            ai_client: Optional[Any],
-                            task: str = "missing_shingles") -> List[Dict[str, Any]]:
-    """Use the AI client to classify/label detected damage areas."""
-    if not ai_client or not damage_areas:
-        return damage_areas
 
-    prompt_template = """You are an expert roof inspector. Given the bounding boxes below,
+_ANNOTATE_PROMPT_HEAD = """You are an expert roof inspector. Given the bounding boxes below,
 classify each area and assign a severity.
 
 Task: {task}
 Bounding boxes:
-{boxes}
+"""
+_ANNOTATE_PROMPT_TAIL = """
 
 Return ONLY JSON:
-{{
+{
   \"classifications\": [
-    {{
+    {
       \"bbox\": [x1, y1, x2, y2],
       \"damage_type\": \"missing_shingles|cracks|hail_impact|water_stains|unknown\",
       \"severity\": \"minor|moderate|severe\"
-    }}
+    }
   ]
-}}
+}
 """
 
+
+def _dumps_bboxes(bboxes: List[List[int]]) -> str:
+    """Serialize bbox lists for a prompt, with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(bboxes).decode()
+        except TypeError:
+            pass
+    return json.dumps(bboxes)
+
+
+def annotate_damage_with_ai(image_bytes: bytes,
+                            damage_areas: List[Dict[str, Any]],
+                            ai_client: Optional[Any],
+                            task: str = "missing_shingles") -> List[Dict[str, Any]]:
+    """Use the AI client to classify/label detected damage areas."""
+    if not ai_client or not damage_areas:
+        return damage_areas
+
     # Filter to only include areas with valid bbox
     areas_with_bbox = [area for area in damage_areas if "bbox" in area and len(area["bbox"]) == 4]
     updated = {tuple(area["bbox"]): area for area in areas_with_bbox}
 
+    # Only the boxes change between chunks; render the task into the head once
+    prompt_head = _ANNOTATE_PROMPT_HEAD.format(task=task)
     for chunk in _chunk_damage_areas(areas_with_bbox):
-        boxes_json = json.dumps([area["bbox"] for area in chunk])
-        prompt = prompt_template.format(task=task, boxes=boxes_json)
+        prompt = prompt_head + _dumps_bboxes([area["bbox"] for area in chunk]) + _ANNOTATE_PROMPT_TAIL
         result, provider = ai_client.detect_content(image_bytes, prompt)
         if not result or "classifications" not in result:
             continue
@@ -497,7 +841,10 @@ Return ONLY JSON:
     return list(updated.values())
 
 
-def classify_damage_types(image_bytes: bytes, damage_areas: List[Dict[str, Any]], ai_client: Optional[Any] = None) -> List[Dict[str, Any]]:
+def classify_damage_types(image_bytes: bytes,
+                          damage_areas: List[Dict[str, Any]],
+                          ai_client: Optional[Any] = None,
+                          min_iou: float = 0.3) -> List[Dict[str, Any]]:
     """
     Use AI to classify damage types in detected areas
     
@@ -505,6 +852,7 @@ def classify_damage_types(image_bytes: bytes, damage_areas: List[Dict[str, Any]]
         image_bytes: Original image bytes
         damage_areas: List of damage areas with bbox
         ai_client: AIClient instance
+        min_iou: Minimum IoU for a returned classification to apply to an area
         
     Returns:
         List of damage areas with added damage_type and severity
@@ -539,12 +887,25 @@ Return ONLY valid JSON:
     try:
         result, _ = ai_client.detect_content(image_bytes, prompt)
         if result and "classifications" in result:
-            classifications = {tuple(c["bbox"]): c for c in result["classifications"]}
-            for area in damage_areas:
-                bbox_key = tuple(area["bbox"])
-                if bbox_key in classifications:
-                    area["damage_type"] = classifications[bbox_key].get("damage_type", "unknown")
-                    area["severity"] = classifications[bbox_key].get("severity", "moderate")
+            # The model often echoes slightly perturbed boxes, so match each area to
+            # its best-overlapping classification instead of requiring exact equality
+            classifications = [
+                c for c in result["classifications"]
+                if isinstance(c, dict) and len(c.get("bbox") or []) == 4
+            ]
+            best_match = [-1] * len(damage_areas)
+            if classifications:
+                iou = calculate_overlap_matrix(
+                    [area["bbox"] for area in damage_areas],
+                    [c["bbox"] for c in classifications],
+                )
+                best_idx = iou.argmax(axis=1)
+                matched = iou[np.arange(len(damage_areas)), best_idx] > min_iou
+                best_match = np.where(matched, best_idx, -1).tolist()
+            for area, idx in zip(damage_areas, best_match):
+                if idx >= 0:
+                    area["damage_type"] = classifications[idx].get("damage_type", "unknown")
+                    area["severity"] = classifications[idx].get("severity", "moderate")
                 else:
                     area.setdefault("damage_type", "unknown")
                     area.setdefault("severity", "moderate")
@@ -558,41 +919,45 @@ Return ONLY valid JSON:
     return damage_areas
 
 
-def enhance_colors(image_bytes: bytes) -> bytes:
+def enhance_colors(image_bytes: bytes, jpeg_quality: Optional[int] = None, optimize: bool = True) -> bytes:
     """
     Enhance image colors using histogram equalization and CLAHE
     
     Args:
         image_bytes: Original image bytes
+        jpeg_quality: JPEG quality used to encode the result (1-100);
+            defaults to ENHANCE_JPEG_Q or 85
+        optimize: Whether to enable JPEG Huffman table optimization
         
     Returns:
         Enhanced image bytes
     """
     _ensure_cv2_available()
     _ensure_numpy_available()
-    # Convert to numpy array
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    # Decode to a BGR array
+    img = _decode_bgr(image_bytes)
     
     if img is None:
         raise ValueError("Could not decode image")
     
     # Convert BGR to LAB
     lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
     
-    # Apply CLAHE to L channel
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l_enhanced = clahe.apply(l)
+    # Apply CLAHE to the L channel in place (no split/merge copies of the planes)
+    lab[:, :, 0] = _clahe().apply(np.ascontiguousarray(lab[:, :, 0]))
     
-    # Merge channels
-    lab_enhanced = cv2.merge([l_enhanced, a, b])
+    # Convert back to BGR, reusing the decoded image buffer
+    enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=img)
     
-    # Convert back to BGR
-    enhanced = cv2.cvtColor(lab_enhanced, cv2.COLOR_LAB2BGR)
-    
-    # Convert back to bytes
-    _, buffer = cv2.imencode('.jpg', enhanced)
+    # Convert back to bytes (baseline JPEG: progressive costs more encode CPU)
+    if jpeg_quality is None:
+        jpeg_quality = _enhance_jpeg_quality()
+    params = [
+        cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality),
+        cv2.IMWRITE_JPEG_OPTIMIZE, 1 if optimize else 0,
+        cv2.IMWRITE_JPEG_PROGRESSIVE, 0,
+    ]
+    _, buffer = cv2.imencode('.jpg', enhanced, params)
     return buffer.tobytes()
 
 
@@ -608,8 +973,7 @@ def convert_to_lab_colorspace(image_bytes: bytes) -> Any:
     """
     _ensure_cv2_available()
     _ensure_numpy_available()
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    img = _decode_bgr(image_bytes)
     
     if img is None:
         raise ValueError("Could not decode image")
@@ -704,6 +1068,87 @@ def calculate_overlap(bbox1: List[int], bbox2: List[int]) -> float:
     return intersection / union
 
 
+def calculate_overlap_matrix(bboxes1: List[List[int]], bboxes2: List[List[int]]) -> "np.ndarray":
+    """
+    Calculate pairwise Intersection over Union (IoU) for two sets of bounding boxes
+    
+    Args:
+        bboxes1: N boxes as [x1, y1, x2, y2]
+        bboxes2: M boxes as [x1, y1, x2, y2]
+        
+    Returns:
+        (N, M) array of IoU scores, element-wise equal to calculate_overlap
+    """
+    _ensure_numpy_available()
+    boxes1 = np.asarray(bboxes1, dtype=np.float64).reshape(-1, 4)
+    boxes2 = np.asarray(bboxes2, dtype=np.float64).reshape(-1, 4)
+
+    # Broadcast (N, 1) against (1, M) to get every pairwise intersection at once
+    x1_i = np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    y1_i = np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    x2_i = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2])
+    y2_i = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3])
+
+    inter_w = x2_i - x1_i
+    inter_h = y2_i - y1_i
+    overlapping = (inter_w > 0) & (inter_h > 0)
+    intersection = np.where(overlapping, inter_w * inter_h, 0.0)
+
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union = area1[:, None] + area2[None, :] - intersection
+
+    iou = np.zeros_like(intersection)
+    np.divide(intersection, union, out=iou, where=overlapping & (union != 0))
+    return iou
+
+
+# Spatial hashing for merge_damage_areas: below _GRID_MIN_BOXES a full vector
+# scan is cheaper than bucket lookups
+_GRID_CELL = 128
+_GRID_MAX_CELLS = 256
+_GRID_MIN_BOXES = 16
+
+
+class _BoxGrid:
+    """
+    Coarse grid of box indices. Each box is registered in every cell it covers,
+    so any two boxes with positive overlap share a cell. Stale registrations
+    after a box moves only add candidates, never hide one.
+    """
+
+    def __init__(self, cell: int = _GRID_CELL):
+        self.cell = cell
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        # Boxes spanning too many cells are checked against every query
+        self.oversized: List[int] = []
+
+    def _cell_span(self, bbox: List[int]) -> Tuple[range, range]:
+        x1, y1, x2, y2 = bbox
+        return (range(int(x1 // self.cell), int(x2 // self.cell) + 1),
+                range(int(y1 // self.cell), int(y2 // self.cell) + 1))
+
+    def add(self, idx: int, bbox: List[int]) -> None:
+        xs, ys = self._cell_span(bbox)
+        if len(xs) * len(ys) > _GRID_MAX_CELLS:
+            self.oversized.append(idx)
+            return
+        for cx in xs:
+            for cy in ys:
+                self.cells.setdefault((cx, cy), []).append(idx)
+
+    def nearby(self, bbox: List[int]) -> Optional["np.ndarray"]:
+        """Sorted indices that may overlap bbox, or None if the query is too large to bucket."""
+        xs, ys = self._cell_span(bbox)
+        if len(xs) * len(ys) > _GRID_MAX_CELLS:
+            return None
+        found = set(self.oversized)
+        for cx in xs:
+            for cy in ys:
+                found.update(self.cells.get((cx, cy), ()))
+        return np.array(sorted(found), dtype=np.intp)
+
+
 def merge_damage_areas(primary: List[Dict[str, Any]],
                        secondary: List[Dict[str, Any]],
                        iou_threshold: float = 0.4) -> List[Dict[str, Any]]:
@@ -711,27 +1156,47 @@ def merge_damage_areas(primary: List[Dict[str, Any]],
     Merge two lists of damage areas, preferring higher-confidence entries when overlapping.
     """
     merged: List[Dict[str, Any]] = [dict(area) for area in primary]
+    if not secondary:
+        return merged
+
+    # Boxes of merged entries, kept in step with `merged` as it grows; entries
+    # without a valid bbox get an empty box, which never overlaps anything
+    merged_boxes = np.zeros((len(merged) + len(secondary), 4), dtype=np.float64)
+    grid = _BoxGrid()
+    for idx, existing in enumerate(merged):
+        existing_bbox = existing.get("bbox", [])
+        if len(existing_bbox) == 4:
+            merged_boxes[idx] = existing_bbox
+            grid.add(idx, existing_bbox)
 
     for candidate in secondary:
         bbox = candidate.get("bbox")
         if not bbox or len(bbox) != 4:
             continue
 
-        best_match = None
-        best_iou = 0.0
-        for existing in merged:
-            existing_bbox = existing.get("bbox", [])
-            if len(existing_bbox) != 4:
-                continue
-            iou = calculate_overlap(existing_bbox, bbox)
-            if iou > best_iou:
-                best_iou = iou
-                best_match = existing
-
-        if best_match and best_iou >= iou_threshold:
+        best_idx = -1
+        nearby = grid.nearby(bbox) if len(merged) > _GRID_MIN_BOXES else None
+        if nearby is None:
+            candidates = merged_boxes[:len(merged)]
+        else:
+            candidates = merged_boxes[nearby]
+        if len(candidates):
+            ious = calculate_overlap_matrix(candidates, [bbox])[:, 0]
+            # nearby is sorted, so argmax keeps the first of equal scores as the
+            # sequential scan did
+            pos = int(ious.argmax())
+            if ious[pos] >= iou_threshold and ious[pos] > 0.0:
+                best_idx = pos if nearby is None else int(nearby[pos])
+
+        if best_idx >= 0:
+            best_match = merged[best_idx]
             if candidate.get("confidence", 0) > best_match.get("confidence", 0):
                 best_match.update(candidate)
+                merged_boxes[best_idx] = bbox
+                grid.add(best_idx, bbox)
         else:
+            grid.add(len(merged), bbox)
+            merged_boxes[len(merged)] = bbox
             merged.append(candidate)
 
     return merged
@@ -750,22 +1215,22 @@ def filter_large_damage_areas(damage_areas: List[Dict[str, Any]],
         return damage_areas
 
     image_area = image_width * image_height
-    filtered: List[Dict[str, Any]] = []
-
-    for area in damage_areas:
-        bbox = area.get("bbox")
-        if not bbox or len(bbox) != 4:
-            continue
-        x1, y1, x2, y2 = bbox
-        area_w = max(0, x2 - x1)
-        area_h = max(0, y2 - y1)
-        bbox_area = area_w * area_h
-        fraction = bbox_area / float(image_area) if image_area else 0.0
+    candidates = [
+        area for area in damage_areas
+        if area.get("bbox") and len(area["bbox"]) == 4
+    ]
+    if not candidates:
+        return damage_areas
+    if len(damage_areas) <= 1:
+        return candidates
 
-        if len(damage_areas) > 1 and fraction > max_fraction:
-            continue
-        filtered.append(area)
+    # Area fractions for all boxes in one vector op
+    boxes = np.asarray([area["bbox"] for area in candidates], dtype=np.float64)
+    widths = np.clip(boxes[:, 2] - boxes[:, 0], 0, None)
+    heights = np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    keep = (widths * heights) / float(image_area) <= max_fraction
 
+    filtered = [area for area, kept in zip(candidates, keep.tolist()) if kept]
     return filtered if filtered else damage_areas
 
 
@@ -779,11 +1244,32 @@ def count_damage_instances(damage_areas: List[Dict[str, Any]]) -> Dict[str, int]
     Returns:
         Dictionary mapping damage_type to count
     """
-    counts = {}
-    for area in damage_areas:
-        damage_type = area.get("damage_type", "unknown")
-        counts[damage_type] = counts.get(damage_type, 0) + 1
-    return counts
+    return dict(Counter(area.get("damage_type", "unknown") for area in damage_areas))
+
+
+def _pixel_span(start: int, stop: int, limit: int) -> slice:
+    """Slice covering inclusive [start, stop] clipped to [0, limit)."""
+    return slice(max(start, 0), max(min(stop, limit - 1) + 1, 0))
+
+
+def _fill_box_rgba(canvas: "np.ndarray",
+                   bbox: List[int],
+                   fill: Tuple[int, ...],
+                   outline: Tuple[int, ...],
+                   width: int = 2) -> None:
+    """
+    Paint a filled, outlined box into an RGBA array in place, matching
+    ImageDraw.rectangle(bbox, fill, outline, width) for boxes wider than width.
+    """
+    height, img_width = canvas.shape[:2]
+    x1, y1, x2, y2 = bbox
+    rows = _pixel_span(y1, y2, height)
+    cols = _pixel_span(x1, x2, img_width)
+    canvas[rows, cols] = fill
+    canvas[_pixel_span(y1, min(y1 + width - 1, y2), height), cols] = outline
+    canvas[_pixel_span(max(y2 - width + 1, y1), y2, height), cols] = outline
+    canvas[rows, _pixel_span(x1, min(x1 + width - 1, x2), img_width)] = outline
+    canvas[rows, _pixel_span(max(x2 - width + 1, x1), x2, img_width)] = outline
 
 
 def generate_overlay(
@@ -791,7 +1277,8 @@ def generate_overlay(
     damage_areas: List[Dict[str, Any]],
     confidences: Optional[List[float]] = None,
     damage_types: Optional[List[str]] = None,
-    counts: Optional[Dict[str, int]] = None
+    counts: Optional[Dict[str, int]] = None,
+    image_format: str = "PNG"
 ) -> bytes:
     """
     Generate overlay image with damage areas highlighted
@@ -802,35 +1289,28 @@ def generate_overlay(
         confidences: Optional list of confidence scores
         damage_types: Optional list of damage types
         counts: Optional dictionary of damage counts by type
+        image_format: "PNG" for full RGBA output, or "PNG8" for a 64-color
+            palette PNG (smaller and faster to encode, visualization only)
         
     Returns:
         Overlay image bytes (PNG with transparency)
     """
-    # Load original image (used for positioning only)
-    img = Image.open(io.BytesIO(original_image_bytes)).convert("RGBA")
-    
-    # Create transparent overlay layer (no base image)
-    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
-    
-    # Color mapping for damage types
-    damage_colors = {
-        "missing_shingles": (255, 0, 0, 128),      # Red
-        "cracks": (255, 165, 0, 128),               # Orange
-        "hail_impact": (255, 255, 0, 128),         # Yellow
-        "water_stains": (0, 0, 255, 128),          # Blue
-        "sagging": (128, 0, 128, 128),            # Purple
-        "discoloration": (0, 255, 255, 128),      # Cyan
-        "unknown": (128, 128, 128, 128)           # Gray
-    }
+    _ensure_numpy_available()
+
+    # Only the original's size is needed for positioning; read it from the header
+    img_width, img_height = Image.open(io.BytesIO(original_image_bytes)).size
+    damage_colors = _DAMAGE_COLORS
+    font = _LABEL_FONT
     
-    # Draw damage areas
+    # Fill boxes straight into a transparent RGBA array (no base image)
+    canvas = np.zeros((img_height, img_width, 4), dtype=np.uint8)
+    labels: List[Tuple[int, int, str]] = []
     for i, area in enumerate(damage_areas):
         bbox = area.get("bbox", [])
         if len(bbox) != 4:
             continue
         
-        x1, y1, x2, y2 = bbox
+        x1, y1, x2, y2 = (int(v) for v in bbox)
         damage_type = damage_types[i] if damage_types and i < len(damage_types) else area.get("damage_type", "unknown")
         confidence = confidences[i] if confidences and i < len(confidences) else area.get("confidence", 0.5)
         
@@ -839,32 +1319,21 @@ def generate_overlay(
         # Adjust alpha based on confidence
         color = (*color[:3], int(color[3] * confidence))
         
-        # Draw rectangle
-        draw.rectangle([x1, y1, x2, y2], fill=color, outline=(*color[:3], 255), width=2)
-        
-        # Add label
-        label = f"{damage_type}\n{confidence:.2f}"
-        try:
-            font = ImageFont.truetype("arial.ttf", 12)
-        except:
-            font = ImageFont.load_default()
-        
-        # Draw text background
+        _fill_box_rgba(canvas, [x1, y1, x2, y2], color, (*color[:3], 255))
+        labels.append((x1, y1, f"{damage_type}\n{confidence:.2f}"))
+    
+    # Labels are drawn last so a later box never hides an earlier label
+    result = Image.fromarray(canvas)
+    draw = ImageDraw.Draw(result)
+    for x1, y1, label in labels:
         text_bbox = draw.textbbox((x1, y1), label, font=font)
         draw.rectangle(text_bbox, fill=(0, 0, 0, 200))
         draw.text((x1, y1), label, fill=(255, 255, 255, 255), font=font)
     
-    # Use overlay layer as the export target (no base image)
-    result = overlay.copy()
-    
     # Add damage counts legend if provided
     if counts:
         legend_img = Image.new("RGBA", (200, len(counts) * 25 + 20), (0, 0, 0, 200))
         legend_draw = ImageDraw.Draw(legend_img)
-        try:
-            font = ImageFont.truetype("arial.ttf", 12)
-        except:
-            font = ImageFont.load_default()
         
         y_offset = 10
         legend_draw.text((10, y_offset), "Damage Counts:", fill=(255, 255, 255, 255), font=font)
@@ -881,7 +1350,12 @@ def generate_overlay(
     
     # Convert to bytes
     output = io.BytesIO()
-    result.save(output, format="PNG")
+    if image_format == "PNG8":
+        # Few distinct colors: a palette keeps alpha via tRNS at a fraction of the size
+        result = result.quantize(colors=64, method=Image.Quantize.FASTOCTREE)
+        result.save(output, format="PNG", optimize=False)
+    else:
+        result.save(output, format="PNG")
     return output.getvalue()
 
 
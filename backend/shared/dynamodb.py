@@ -2,22 +2,31 @@
 DynamoDB operations for metadata storage
 """
 import os
+from functools import lru_cache
 import boto3
 from botocore.exceptions import ClientError
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
 from .models import PhotoMetadata
 
 
+@lru_cache(maxsize=4)
 def get_dynamodb_client(region: str = 'us-east-2'):
-    """Get DynamoDB client"""
+    """Get DynamoDB client (one per region, reused across warm invocations)"""
     return boto3.client('dynamodb', region_name=region)
 
 
+@lru_cache(maxsize=4)
 def get_dynamodb_resource(region: str = 'us-east-2'):
-    """Get DynamoDB resource"""
+    """Get DynamoDB resource (one per region, reused across warm invocations)"""
     return boto3.resource('dynamodb', region_name=region)
 
 
+@lru_cache(maxsize=8)
+def _get_table(table_name: str, region: str = 'us-east-2'):
+    """Get a DynamoDB Table handle, reused across warm invocations"""
+    return get_dynamodb_resource(region).Table(table_name)
+
+
 def put_metadata(
     table_name: str,
     metadata: PhotoMetadata,
@@ -35,8 +44,7 @@ def put_metadata(
         True if successful, False otherwise
     """
     try:
-        dynamodb = get_dynamodb_resource(region)
-        table = dynamodb.Table(table_name)
+        table = _get_table(table_name, region)
         
         item = metadata.to_dynamodb_item()
         # Resource API handles type conversion automatically
@@ -50,6 +58,41 @@ def put_metadata(
         return False
 
 
+def put_metadata_batch(
+    table_name: str,
+    items: Iterable[PhotoMetadata],
+    region: str = 'us-east-2'
+) -> bool:
+    """
+    Store several photo metadata records with BatchWriteItem
+    
+    The batch writer sends up to 25 items per request and resubmits
+    unprocessed items, so N records cost about N/25 round trips instead of N.
+    Later records for the same photo_id replace earlier ones in the batch.
+    
+    Args:
+        table_name: DynamoDB table name
+        items: PhotoMetadata objects
+        region: AWS region
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        table = _get_table(table_name, region)
+        
+        with table.batch_writer(overwrite_by_pkeys=['photo_id']) as batch:
+            for metadata in items:
+                batch.put_item(Item=metadata.to_dynamodb_item())
+        return True
+    except ClientError as e:
+        print(f"Error storing metadata batch: {e}")
+        return False
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        return False
+
+
 def get_metadata(
     table_name: str,
     photo_id: str,
@@ -67,8 +110,7 @@ def get_metadata(
         PhotoMetadata object or None if not found
     """
     try:
-        dynamodb = get_dynamodb_resource(region)
-        table = dynamodb.Table(table_name)
+        table = _get_table(table_name, region)
         
         response = table.get_item(Key={'photo_id': photo_id})
         
@@ -1,9 +1,68 @@
 """
 Image preprocessing utilities for optimization
+
+JPEG decode/encode speed here depends on the codec Pillow is linked against.
+The Pillow manylinux wheels pinned in the Lambda requirements (10.x) bundle
+libjpeg-turbo, which PIL.features.check_feature("libjpeg_turbo") confirms;
+keep that true when changing the pin or building Pillow from source.
 """
 from typing import Tuple, Optional, Dict, List
 from PIL import Image
 import io
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    np = None
+try:
+    import cv2  # type: ignore
+except ImportError:  # pragma: no cover
+    cv2 = None
+
+# libjpeg DCT-domain reductions; the exact resize happens afterwards
+_REDUCED_JPEG_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+} if cv2 is not None else {}
+
+
+def _ensure_numpy_available() -> None:
+    """Ensure numpy is available before running the batch bbox helpers."""
+    if np is None:
+        raise ImportError(
+            "NumPy is not available. Attach the CvDependenciesLayer to this Lambda."
+        )
+
+
+def _resize_jpeg_cv2(
+    image_bytes: bytes,
+    size: Tuple[int, int],
+    new_size: Tuple[int, int],
+    quality: int
+) -> Optional[bytes]:
+    """
+    Downscale an RGB JPEG with OpenCV: reduced decode, INTER_AREA, re-encode.
+    
+    Returns:
+        JPEG bytes, or None if OpenCV could not decode/encode the image
+    """
+    factor = 1
+    for candidate in (8, 4, 2):
+        if size[0] // candidate >= new_size[0] and size[1] // candidate >= new_size[1]:
+            factor = candidate
+            break
+    # Ignore EXIF orientation like the Pillow path, so new_size still matches
+    flags = _REDUCED_JPEG_FLAGS.get(factor, cv2.IMREAD_COLOR) | cv2.IMREAD_IGNORE_ORIENTATION
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flags)
+    if img is None:
+        return None
+    resized = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(
+        '.jpg',
+        resized,
+        [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1],
+    )
+    return encoded.tobytes() if ok else None
 
 
 def resize_image_if_needed(
@@ -25,7 +84,9 @@ def resize_image_if_needed(
         Tuple of (resized_image_bytes, was_resized)
     """
     try:
-        img = Image.open(io.BytesIO(image_bytes))
+        # Only JPEG/PNG are re-encoded below; restricting the probe also keeps
+        # Pillow from importing every plugin when an upload is neither
+        img = Image.open(io.BytesIO(image_bytes), formats=['JPEG', 'PNG'])
         original_size = img.size
         
         # Check if resize is needed
@@ -36,12 +97,25 @@ def resize_image_if_needed(
         ratio = min(max_width / img.size[0], max_height / img.size[1])
         new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
         
+        source_format = img.format
+        
+        # RGB JPEGs (the usual phone photo): OpenCV's SIMD INTER_AREA path
+        if source_format == 'JPEG' and img.mode == 'RGB' and cv2 is not None and np is not None:
+            resized = _resize_jpeg_cv2(image_bytes, img.size, new_size, quality)
+            if resized is not None:
+                return resized, True
+        
+        # For JPEGs let libjpeg decode straight at the largest 1/2, 1/4 or 1/8
+        # scale that still covers new_size; LANCZOS does the exact resize
+        if source_format == 'JPEG':
+            img.draft(img.mode, new_size)
+        
         # Resize
         img = img.resize(new_size, Image.Resampling.LANCZOS)
         
-        # Convert back to bytes
+        # Convert back to bytes (resize() drops .format, so use the source's)
         output = io.BytesIO()
-        if img.format == 'PNG':
+        if source_format == 'PNG':
             img.save(output, format='PNG', optimize=True)
         else:
             img.save(output, format='JPEG', quality=quality, optimize=True)
@@ -53,6 +127,10 @@ def resize_image_if_needed(
         return image_bytes, False
 
 
+_JPEG_MAGIC = b'\xff\xd8\xff'
+_PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+
+
 def validate_image(image_bytes: bytes) -> Tuple[bool, Optional[str]]:
     """
     Validate image format and size
@@ -63,17 +141,22 @@ def validate_image(image_bytes: bytes) -> Tuple[bool, Optional[str]]:
     Returns:
         Tuple of (is_valid, error_message)
     """
+    # Check size (max 10MB) before touching the data
+    if len(image_bytes) > 10 * 1024 * 1024:
+        return False, "Image too large (max 10MB)"
+    
+    # Common case: JPEG/PNG signature, no need to build a PIL image
+    if image_bytes[:3] == _JPEG_MAGIC or image_bytes[:8] == _PNG_MAGIC:
+        return True, None
+    
     try:
+        # Anything else: let Pillow name the format for the error message
         img = Image.open(io.BytesIO(image_bytes))
         
         # Check format
         if img.format not in ['JPEG', 'PNG', 'JPG']:
             return False, f"Unsupported format: {img.format}"
         
-        # Check size (max 10MB)
-        if len(image_bytes) > 10 * 1024 * 1024:
-            return False, "Image too large (max 10MB)"
-        
         return True, None
         
     except Exception as e:
@@ -94,6 +177,7 @@ def pixel_to_grid_coords(x: int, y: int, image_width: int, image_height: int, gr
     Returns:
         Dictionary with 'row' and 'col' grid coordinates
     """
+    # bbox_to_grid_coords_batch vectorizes this exact formula; keep them in step
     col = int((x / image_width) * grid_size)
     row = int((y / image_height) * grid_size)
     return {"row": min(row, grid_size - 1), "col": min(col, grid_size - 1)}
@@ -122,6 +206,35 @@ def bbox_to_grid_coords(bbox: List[int], image_width: int, image_height: int, gr
     return pixel_to_grid_coords(int(center_x), int(center_y), image_width, image_height, grid_size)
 
 
+def bbox_to_grid_coords_batch(
+    bboxes: "np.ndarray",
+    image_width: int,
+    image_height: int,
+    grid_size: int = 10
+) -> "np.ndarray":
+    """
+    Batch form of bbox_to_grid_coords for many boxes at once
+    
+    Args:
+        bboxes: Array of shape (N, 4) with [x1, y1, x2, y2] rows
+        image_width: Image width in pixels
+        image_height: Image height in pixels
+        grid_size: Number of grid divisions
+        
+    Returns:
+        Integer array of shape (N, 2) with [row, col] per box, identical to
+        calling bbox_to_grid_coords on each box
+    """
+    _ensure_numpy_available()
+    boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    # Same truncation steps as the scalar path: center -> int -> grid cell
+    center_x = ((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int64)
+    center_y = ((boxes[:, 1] + boxes[:, 3]) / 2).astype(np.int64)
+    col = np.minimum(((center_x / image_width) * grid_size).astype(np.int64), grid_size - 1)
+    row = np.minimum(((center_y / image_height) * grid_size).astype(np.int64), grid_size - 1)
+    return np.stack([row, col], axis=1)
+
+
 def calculate_bbox_area(bbox: List[int]) -> int:
     """
     Calculate area of bounding box
@@ -141,6 +254,23 @@ def calculate_bbox_area(bbox: List[int]) -> int:
     return width * height
 
 
+def calculate_bbox_area_batch(bboxes: "np.ndarray") -> "np.ndarray":
+    """
+    Batch form of calculate_bbox_area
+    
+    Args:
+        bboxes: Array of shape (N, 4) with [x1, y1, x2, y2] rows
+        
+    Returns:
+        Array of shape (N,) with the area of each box (0 for inverted boxes)
+    """
+    _ensure_numpy_available()
+    boxes = np.asarray(bboxes).reshape(-1, 4)
+    width = np.maximum(boxes[:, 2] - boxes[:, 0], 0)
+    height = np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+    return width * height
+
+
 def bbox_intersection(bbox1: List[int], bbox2: List[int]) -> Optional[List[int]]:
     """
     Calculate intersection of two bounding boxes
@@ -168,3 +298,29 @@ def bbox_intersection(bbox1: List[int], bbox2: List[int]) -> Optional[List[int]]
     
     return [x1_i, y1_i, x2_i, y2_i]
 
+
+def bbox_intersection_matrix(
+    bboxes1: "np.ndarray",
+    bboxes2: "np.ndarray"
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Pairwise form of bbox_intersection for two sets of boxes
+    
+    Args:
+        bboxes1: Array of shape (N, 4) with [x1, y1, x2, y2] rows
+        bboxes2: Array of shape (K, 4) with [x1, y1, x2, y2] rows
+        
+    Returns:
+        Tuple of (intersections, valid): an (N, K, 4) array holding the
+        intersection box of every pair and an (N, K) bool mask that is False
+        where bbox_intersection would return None
+    """
+    _ensure_numpy_available()
+    a = np.asarray(bboxes1).reshape(-1, 4)
+    b = np.asarray(bboxes2).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    valid = (x2 > x1) & (y2 > y1)
+    return np.stack([x1, y1, x2, y2], axis=-1), valid
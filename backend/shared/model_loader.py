@@ -3,21 +3,68 @@ Utilities for downloading and caching ML models (e.g., YOLO ONNX weights).
 """
 from __future__ import annotations
 
+import hashlib
+import io
 import os
+import sqlite3
 import threading
-from typing import Optional
+from typing import Any, Callable, Optional
 
-import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 
+from .s3 import get_s3_client
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
 try:
     import onnxruntime as ort  # type: ignore
 except ImportError:  # pragma: no cover
     ort = None  # type: ignore
 
 MODEL_CACHE_DIR = "/tmp/roof-models"
-_session_cache: dict[str, "ort.InferenceSession"] = {}
+# Model weights are tens of MB: fetch them as parallel 8 MB ranged GETs
+_MODEL_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+
+
+class _LockedSession:
+    """
+    Cached ONNX session whose run() is serialized per session, so concurrent
+    callers never enter the same session at once. Read-only metadata
+    (get_inputs, get_outputs, ...) is forwarded without locking.
+    """
+
+    __slots__ = ("sess", "_lock")
+
+    def __init__(self, sess: "ort.InferenceSession", lock: Optional[threading.RLock] = None) -> None:
+        self.sess = sess
+        self._lock = lock or threading.RLock()
+
+    def run(self, *args, **kwargs):
+        with self._lock:
+            return self.sess.run(*args, **kwargs)
+
+    def get_inputs(self):
+        return self.sess.get_inputs()
+
+    def get_outputs(self):
+        return self.sess.get_outputs()
+
+    def __getattr__(self, name: str):
+        return getattr(self.sess, name)
+
+
+_session_cache: dict[str, _LockedSession] = {}
 _session_lock = threading.RLock()
+_env_allocator_registered = False
 
 
 def _ensure_cache_dir() -> None:
@@ -25,8 +72,9 @@ def _ensure_cache_dir() -> None:
 
 
 def _safe_filename(bucket: str, key: str) -> str:
-    sanitized = key.replace("/", "_")
-    return f"{bucket}_{sanitized}"
+    # Hash instead of replacing "/": "a/b_c" and "a_b/c" must not collide
+    digest = hashlib.blake2b(f"{bucket}/{key}".encode(), digest_size=16).hexdigest()
+    return digest + (os.path.splitext(key)[1] or ".onnx")
 
 
 def get_local_model_path(bucket: str, key: str) -> str:
@@ -56,10 +104,10 @@ def download_model_if_needed(
     if os.path.isfile(local_path) and not force:
         return local_path
 
-    s3_client = boto3.client("s3", region_name=region)
+    s3_client = get_s3_client(region)
     tmp_path = f"{local_path}.download"
     try:
-        s3_client.download_file(bucket, key, tmp_path)
+        s3_client.download_file(bucket, key, tmp_path, Config=_MODEL_TRANSFER_CONFIG)
         os.replace(tmp_path, local_path)
         return local_path
     except ClientError as err:
@@ -69,9 +117,71 @@ def download_model_if_needed(
         return None
 
 
-def get_onnx_session(model_path: str) -> "ort.InferenceSession":
+def _ort_thread_count() -> int:
+    """
+    Intra-op thread count: ORT_NUM_THREADS/OMP_NUM_THREADS, else one per
+    Lambda vCPU (1769 MB each) instead of ORT's default of every host core.
+    """
+    override = os.environ.get("ORT_NUM_THREADS") or os.environ.get("OMP_NUM_THREADS")
+    if override:
+        try:
+            return max(1, int(override))
+        except ValueError:
+            pass
+    memory_mb = os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+    if memory_mb and memory_mb.isdigit():
+        return max(1, int(memory_mb) // 1769)
+    return 0  # let onnxruntime decide outside Lambda
+
+
+def _register_env_allocator() -> None:
+    """
+    Register one CPU arena on the ORT environment so every session shares it
+    (the Python API in this onnxruntime has no PrepackedWeightsContainer).
+    """
+    global _env_allocator_registered
+    if _env_allocator_registered:
+        return
+    mem_info = ort.OrtMemoryInfo("Cpu", ort.OrtAllocatorType.ORT_ARENA_ALLOCATOR, 0, ort.OrtMemType.DEFAULT)
+    ort.create_and_register_allocator(mem_info, None)
+    _env_allocator_registered = True
+
+
+def _session_options() -> "ort.SessionOptions":
+    """
+    SessionOptions shared by every cached session.
+    """
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = _ort_thread_count()
+    options.add_session_config_entry("session.use_env_allocators", "1")
+    return options
+
+
+def _prefetch_file(path: str) -> None:
+    """
+    Ask the kernel to read the whole file ahead, so ORT's model parse hits
+    resident pages instead of faulting them in one read at a time.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def get_onnx_session(model_path: str) -> _LockedSession:
     """
     Lazily load and cache an ONNX runtime session for the given model path.
+    The session is wrapped so concurrent run() calls are serialized.
     """
     if ort is None:
         raise RuntimeError(
@@ -82,20 +192,116 @@ def get_onnx_session(model_path: str) -> "ort.InferenceSession":
         session = _session_cache.get(model_path)
         if session:
             return session
-        session = ort.InferenceSession(
-            model_path,
-            providers=["CPUExecutionProvider"],
+        _register_env_allocator()
+        _prefetch_file(model_path)
+        session = _LockedSession(
+            ort.InferenceSession(
+                model_path,
+                sess_options=_session_options(),
+                providers=["CPUExecutionProvider"],
+            )
         )
         _session_cache[model_path] = session
         return session
 
 
+_inference_db: Optional[sqlite3.Connection] = None
+_inference_db_lock = threading.Lock()
+
+
+def _inference_cache_path() -> str:
+    """
+    SQLite file for cached model outputs; INFERENCE_CACHE_DB="" disables it.
+    """
+    return os.environ.get("INFERENCE_CACHE_DB", os.path.join(MODEL_CACHE_DIR, "cache.db"))
+
+
+def _inference_cache_max_rows() -> int:
+    """Rows kept in the inference cache (INFERENCE_CACHE_MAX_ROWS, at least 1; default 256)."""
+    try:
+        return max(1, int(os.environ.get("INFERENCE_CACHE_MAX_ROWS", "256")))
+    except ValueError:
+        return 256
+
+
+def _get_inference_db() -> Optional[sqlite3.Connection]:
+    global _inference_db
+    path = _inference_cache_path()
+    if not path:
+        return None
+    if _inference_db is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS inference (key BLOB PRIMARY KEY, output BLOB NOT NULL)"
+        )
+        conn.commit()
+        _inference_db = conn
+    return _inference_db
+
+
+def _inference_key(session_key: str, image_bytes: bytes, params: Any) -> bytes:
+    image_digest = hashlib.blake2b(image_bytes, digest_size=16).digest()
+    param_digest = hashlib.blake2b(f"{session_key}|{params!r}".encode(), digest_size=16).digest()
+    return image_digest + param_digest
+
+
+def infer_cached(
+    session_key: str,
+    image_bytes: bytes,
+    params: Any,
+    infer: Callable[[], "np.ndarray"],
+) -> "np.ndarray":
+    """
+    Return infer() for this (model, image, params), reusing a result stored
+    in /tmp by an earlier invocation of the same container when available.
+
+    Retries and workflow re-drives on the same photo then skip the model run.
+    Only the newest INFERENCE_CACHE_MAX_ROWS results are kept. Cache errors
+    are logged and fall back to calling infer().
+    """
+    if np is None:
+        return infer()
+    key = _inference_key(session_key, image_bytes, params)
+    with _inference_db_lock:
+        try:
+            conn = _get_inference_db()
+            row = conn.execute("SELECT output FROM inference WHERE key = ?", (key,)).fetchone() if conn else None
+        except sqlite3.Error as err:
+            print(f"Inference cache read failed: {err}")
+            conn, row = None, None
+    if row is not None:
+        return np.load(io.BytesIO(row[0]), allow_pickle=False)
+
+    output = infer()
+    if conn is None:
+        return output
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(output), allow_pickle=False)
+    with _inference_db_lock:
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO inference (key, output) VALUES (?, ?)",
+                (key, buffer.getvalue()),
+            )
+            conn.execute(
+                "DELETE FROM inference WHERE rowid <= (SELECT MAX(rowid) FROM inference) - ?",
+                (_inference_cache_max_rows(),),
+            )
+            conn.commit()
+        except sqlite3.Error as err:
+            print(f"Inference cache write failed: {err}")
+    return output
+
+
 def get_or_create_session(
     bucket: str,
     key: str,
     region: str = "us-east-2",
     force_download: bool = False,
-) -> "ort.InferenceSession":
+) -> _LockedSession:
     """
     Download the requested model (if needed) and return an ONNX runtime session.
     """
@@ -112,5 +318,6 @@ __all__ = [
     "get_local_model_path",
     "get_onnx_session",
     "get_or_create_session",
+    "infer_cached",
 ]
 
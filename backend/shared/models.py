@@ -7,6 +7,71 @@ from decimal import Decimal
 from pydantic import BaseModel, Field
 
 
+def _convert_leaves(obj: Any, leaf_type: type, convert) -> Any:
+    """
+    Return obj with every leaf_type value inside nested dicts/lists converted.
+
+    Copy-on-write: containers holding nothing to convert are returned as-is
+    (shared, not rebuilt), and a container is copied only once a value in it
+    actually changes. The input is never mutated.
+    """
+    if isinstance(obj, leaf_type):
+        return convert(obj)
+    if isinstance(obj, dict):
+        out = None
+        for key, value in obj.items():
+            if isinstance(value, leaf_type):
+                new = convert(value)
+            elif isinstance(value, (dict, list)):
+                new = _convert_leaves(value, leaf_type, convert)
+                if new is value:
+                    continue
+            else:
+                continue
+            if out is None:
+                out = dict(obj)
+            out[key] = new
+        return obj if out is None else out
+    if isinstance(obj, list):
+        out = None
+        for index, value in enumerate(obj):
+            if isinstance(value, leaf_type):
+                new = convert(value)
+            elif isinstance(value, (dict, list)):
+                new = _convert_leaves(value, leaf_type, convert)
+                if new is value:
+                    continue
+            else:
+                continue
+            if out is None:
+                out = list(obj)
+            out[index] = new
+        return obj if out is None else out
+    return obj
+
+
+def _float_to_decimal(value: float) -> Decimal:
+    return Decimal(str(value))
+
+
+def _decimal_to_number(value: Decimal) -> Any:
+    # Whole numbers come back as int, everything else as float; comparing to
+    # the integral value is cheaper than the modulo and gives the same answer
+    if value == value.to_integral_value():
+        return int(value)
+    return float(value)
+
+
+def convert_floats(obj: Any) -> Any:
+    """Convert floats to Decimals for DynamoDB, copying only what changes"""
+    return _convert_leaves(obj, float, _float_to_decimal)
+
+
+def convert_decimals(obj: Any) -> Any:
+    """Convert DynamoDB Decimals to int/float, copying only what changes"""
+    return _convert_leaves(obj, Decimal, _decimal_to_number)
+
+
 class BoundingBox(BaseModel):
     """Bounding box coordinates"""
     x1: int = Field(..., description="Top-left x coordinate")
@@ -59,6 +124,18 @@ class Material(BaseModel):
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score")
 
 
+# PhotoMetadata fields written to DynamoDB only when truthy
+_OPTIONAL_ITEM_FIELDS = (
+    'user_id',
+    'processing_time_ms',
+    'ai_provider',
+    'expires_at',
+    'single_agent_results',
+    'single_agent_overlay_s3_key',
+    'single_agent_report_s3_key',
+)
+
+
 class PhotoMetadata(BaseModel):
     """Photo metadata stored in DynamoDB"""
     photo_id: str
@@ -77,16 +154,6 @@ class PhotoMetadata(BaseModel):
 
     def to_dynamodb_item(self) -> Dict[str, Any]:
         """Convert to DynamoDB item format, converting floats to Decimals"""
-        def convert_floats(obj):
-            """Recursively convert floats to Decimals for DynamoDB"""
-            if isinstance(obj, float):
-                return Decimal(str(obj))
-            elif isinstance(obj, dict):
-                return {k: convert_floats(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_floats(item) for item in obj]
-            return obj
-        
         item = {
             'photo_id': self.photo_id,
             'timestamp': self.timestamp,
@@ -95,40 +162,35 @@ class PhotoMetadata(BaseModel):
             'detections': convert_floats(self.detections),
             'materials': convert_floats(self.materials),
         }
-        if self.user_id:
-            item['user_id'] = self.user_id
-        if self.processing_time_ms:
-            item['processing_time_ms'] = self.processing_time_ms
-        if self.ai_provider:
-            item['ai_provider'] = self.ai_provider
-        if self.expires_at:
-            item['expires_at'] = self.expires_at
-        if self.single_agent_results:
-            item['single_agent_results'] = convert_floats(self.single_agent_results)
-        if self.single_agent_overlay_s3_key:
-            item['single_agent_overlay_s3_key'] = self.single_agent_overlay_s3_key
-        if self.single_agent_report_s3_key:
-            item['single_agent_report_s3_key'] = self.single_agent_report_s3_key
+        for field in _OPTIONAL_ITEM_FIELDS:
+            value = getattr(self, field)
+            if value:
+                item[field] = convert_floats(value)
         return item
 
     @classmethod
-    def from_dynamodb_item(cls, item: Dict[str, Any]) -> 'PhotoMetadata':
-        """Create from DynamoDB item, converting Decimals to floats"""
-        def convert_decimals(obj: Any) -> Any:
-            """Recursively convert Decimal types to float/int"""
-            from decimal import Decimal
-            if isinstance(obj, Decimal):
-                # Convert Decimal to float (or int if it's a whole number)
-                if obj % 1 == 0:
-                    return int(obj)
-                return float(obj)
-            elif isinstance(obj, dict):
-                return {key: convert_decimals(value) for key, value in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_decimals(item) for item in obj]
-            return obj
+    def from_dynamodb_item(cls, item: Dict[str, Any], validate: bool = False) -> 'PhotoMetadata':
+        """
+        Create from DynamoDB item, converting Decimals to floats
         
+        Items written by to_dynamodb_item are already well-typed, so by default
+        the model is built with model_construct (no validation). Pass
+        validate=True for items that did not come from this writer.
+        """
         # Convert all Decimals in the item before creating the model
         converted_item = convert_decimals(item)
-        return cls(**converted_item)
+        if validate:
+            return cls(**converted_item)
+        return cls.model_construct(**converted_item)
 
+    @classmethod
+    def from_dynamodb_items(
+        cls,
+        items: List[Dict[str, Any]],
+        validate: bool = False
+    ) -> List['PhotoMetadata']:
+        """Batch form of from_dynamodb_item (one Decimal walk over all items)"""
+        converted_items = convert_decimals(items)
+        if validate:
+            return [cls(**item) for item in converted_items]
+        return [cls.model_construct(**item) for item in converted_items]
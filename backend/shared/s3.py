@@ -2,15 +2,83 @@
 S3 operations for photo storage
 """
 import os
+import time
+from functools import lru_cache
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from typing import Optional
 import uuid
 
 
+# Shared by every cached client: keep connections alive between warm
+# invocations. Addressing style and retries stay at botocore's defaults, since
+# the presigned URL host is part of the frontend's CORS/signature contract
+_S3_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+)
+
+
+@lru_cache(maxsize=4)
 def get_s3_client(region: str = 'us-east-2'):
-    """Get S3 client"""
-    return boto3.client('s3', region_name=region)
+    """Get S3 client (one per region, reused across warm invocations)"""
+    return boto3.client('s3', region_name=region, config=_S3_CONFIG)
+
+
+# Presigned URLs are reused within this window, so a URL handed out may be
+# up to this many seconds into its validity
+_PRESIGN_REUSE_SECONDS = 300
+
+
+def _presign(
+    client_method: str,
+    bucket_name: str,
+    object_key: str,
+    content_type: Optional[str],
+    expiration: int,
+    region: str
+) -> str:
+    """Sign one presigned URL"""
+    params = {'Bucket': bucket_name, 'Key': object_key}
+    if content_type is not None:
+        params['ContentType'] = content_type
+    return get_s3_client(region).generate_presigned_url(
+        client_method,
+        Params=params,
+        ExpiresIn=expiration
+    )
+
+
+@lru_cache(maxsize=1024)
+def _presign_in_window(
+    client_method: str,
+    bucket_name: str,
+    object_key: str,
+    content_type: Optional[str],
+    expiration: int,
+    region: str,
+    window: int
+) -> str:
+    """_presign memoized per reuse window (window only ages entries out)"""
+    return _presign(client_method, bucket_name, object_key, content_type, expiration, region)
+
+
+def _presigned_url(
+    client_method: str,
+    bucket_name: str,
+    object_key: str,
+    content_type: Optional[str],
+    expiration: int,
+    region: str
+) -> str:
+    # Short-lived URLs cannot afford to lose up to a window of validity
+    if expiration <= 2 * _PRESIGN_REUSE_SECONDS:
+        return _presign(client_method, bucket_name, object_key, content_type, expiration, region)
+    window = int(time.time() // _PRESIGN_REUSE_SECONDS)
+    return _presign_in_window(
+        client_method, bucket_name, object_key, content_type, expiration, region, window
+    )
 
 
 def generate_presigned_url(
@@ -34,17 +102,7 @@ def generate_presigned_url(
         Presigned URL or None if error
     """
     try:
-        s3_client = get_s3_client(region)
-        url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': bucket_name,
-                'Key': object_key,
-                'ContentType': content_type
-            },
-            ExpiresIn=expiration
-        )
-        return url
+        return _presigned_url('put_object', bucket_name, object_key, content_type, expiration, region)
     except ClientError as e:
         print(f"Error generating presigned URL: {e}")
         return None
@@ -94,16 +152,7 @@ def generate_presigned_get_url(
     Generate a presigned URL for downloading an object from S3
     """
     try:
-        s3_client = get_s3_client(region)
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': bucket_name,
-                'Key': object_key,
-            },
-            ExpiresIn=expiration
-        )
-        return url
+        return _presigned_url('get_object', bucket_name, object_key, None, expiration, region)
     except ClientError as e:
         print(f"Error generating presigned download URL: {e}")
         return None
@@ -124,6 +173,7 @@ def download_image(bucket_name: str, object_key: str, region: str = 'us-east-2')
     try:
         s3_client = get_s3_client(region)
         response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+        # StreamingBody.read() verifies the content length botocore was sent
         return response['Body'].read()
     except ClientError as e:
         print(f"Error downloading image: {e}")
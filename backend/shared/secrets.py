@@ -3,15 +3,36 @@ Secrets Manager client for retrieving API keys
 """
 import os
 import json
+import time
+from functools import lru_cache
 import boto3
 from botocore.exceptions import ClientError
-from typing import Optional
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+from typing import Optional, Dict, List, Tuple
+
+
+# Resolved secrets are reused across warm invocations for this long, so a
+# rotated secret is picked up without waiting for a cold start
+SECRET_CACHE_TTL_SECONDS = int(os.environ.get('SECRET_CACHE_TTL_SECONDS', '900'))
+_secret_cache: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+
+@lru_cache(maxsize=4)
+def get_secrets_client(region: str = 'us-east-2'):
+    """Get Secrets Manager client (one per region, reused across warm invocations)"""
+    return boto3.client('secretsmanager', region_name=region)
 
 
 def get_secret(secret_name: str, region: str = 'us-east-2') -> Optional[str]:
     """
     Retrieve a secret from AWS Secrets Manager
     
+    Values are cached per (secret_name, region) for SECRET_CACHE_TTL_SECONDS;
+    failed lookups are not cached.
+    
     Args:
         secret_name: Name of the secret
         region: AWS region
@@ -19,37 +40,85 @@ def get_secret(secret_name: str, region: str = 'us-east-2') -> Optional[str]:
     Returns:
         Secret value as string, or None if not found
     """
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region
-    )
+    cached = _cached_secret(secret_name, region)
+    if cached is not None:
+        return cached
+    
+    value = _fetch_secret(secret_name, region)
+    if value is not None:
+        _secret_cache[(secret_name, region)] = (value, time.monotonic())
+    return value
+
+
+def _cached_secret(secret_name: str, region: str) -> Optional[str]:
+    """Cached value for a secret if it is still within the TTL"""
+    cached = _secret_cache.get((secret_name, region))
+    if cached is not None and time.monotonic() - cached[1] < SECRET_CACHE_TTL_SECONDS:
+        return cached[0]
+    return None
+
+
+def _unwrap_secret(secret_value: Dict) -> str:
+    """
+    Extract the key from a GetSecretValue-shaped response
+    
+    Secrets Manager can store secrets as string or JSON; JSON objects yield
+    their 'api_key' or 'key' entry (or first value).
+    """
+    if 'SecretString' in secret_value:
+        secret = secret_value['SecretString']
+        # Try to parse as JSON, fallback to string
+        try:
+            secret_dict = orjson.loads(secret) if orjson is not None else json.loads(secret)
+            # If it's a dict, try to get the key or return the whole dict
+            if isinstance(secret_dict, dict):
+                # Common patterns: check for 'api_key', 'key', or return first value
+                return secret_dict.get('api_key') or secret_dict.get('key') or list(secret_dict.values())[0]
+            return secret
+        except json.JSONDecodeError:
+            return secret
+    else:
+        # Binary secret
+        import base64
+        decoded_binary_secret = base64.b64decode(
+            secret_value['SecretBinary']
+        )
+        return decoded_binary_secret.decode('utf-8')
+
+
+def _prefetch_secrets(secret_names: List[str], region: str) -> None:
+    """
+    Load several secrets into the cache with one BatchGetSecretValue call.
+    
+    Anything the batch does not return (errors, missing permission) is left
+    uncached, so get_secret fetches it individually afterwards.
+    """
+    client = get_secrets_client(region)
+    try:
+        response = client.batch_get_secret_value(SecretIdList=secret_names)
+    except ClientError as e:
+        print(f"Batch secret retrieval failed, fetching individually: {e}")
+        return
+    
+    now = time.monotonic()
+    for secret_value in response.get('SecretValues', []):
+        for secret_name in secret_names:
+            if secret_name in (secret_value.get('Name'), secret_value.get('ARN')):
+                _secret_cache[(secret_name, region)] = (_unwrap_secret(secret_value), now)
+    for error in response.get('Errors', []):
+        print(f"Error retrieving secret {error.get('SecretId')}: {error.get('ErrorCode')}")
+
+
+def _fetch_secret(secret_name: str, region: str) -> Optional[str]:
+    """Fetch and unwrap one secret from Secrets Manager (no caching)"""
+    client = get_secrets_client(region)
     
     try:
         get_secret_value_response = client.get_secret_value(
             SecretId=secret_name
         )
         
-        # Secrets Manager can store secrets as string or JSON
-        if 'SecretString' in get_secret_value_response:
-            secret = get_secret_value_response['SecretString']
-            # Try to parse as JSON, fallback to string
-            try:
-                secret_dict = json.loads(secret)
-                # If it's a dict, try to get the key or return the whole dict
-                if isinstance(secret_dict, dict):
-                    # Common patterns: check for 'api_key', 'key', or return first value
-                    return secret_dict.get('api_key') or secret_dict.get('key') or list(secret_dict.values())[0]
-                return secret
-            except json.JSONDecodeError:
-                return secret
-        else:
-            # Binary secret
-            import base64
-            decoded_binary_secret = base64.b64decode(
-                get_secret_value_response['SecretBinary']
-            )
-            return decoded_binary_secret.decode('utf-8')
+        return _unwrap_secret(get_secret_value_response)
             
     except ClientError as e:
         error_code = e.response['Error']['Code']
@@ -68,16 +137,32 @@ def get_secret(secret_name: str, region: str = 'us-east-2') -> Optional[str]:
         return None
 
 
+def get_keys() -> Dict[str, Optional[str]]:
+    """
+    Get the OpenAI and OpenRouter API keys together
+    
+    Keys not already cached are fetched in a single BatchGetSecretValue round
+    trip instead of one GetSecretValue call each.
+    
+    Returns:
+        Dictionary with 'openai' and 'openrouter' keys (None if unavailable)
+    """
+    region = os.environ.get('REGION', 'us-east-2')
+    secret_names = {
+        'openai': os.environ.get('OPENAI_SECRET_NAME', 'openai-api-key'),
+        'openrouter': os.environ.get('OPENROUTER_SECRET_NAME', 'openrouter-api-key'),
+    }
+    missing = [name for name in secret_names.values() if _cached_secret(name, region) is None]
+    if len(missing) > 1:
+        _prefetch_secrets(missing, region)
+    return {provider: get_secret(name, region) for provider, name in secret_names.items()}
+
+
 def get_openai_key() -> Optional[str]:
     """Get OpenAI API key from Secrets Manager"""
-    secret_name = os.environ.get('OPENAI_SECRET_NAME', 'openai-api-key')
-    region = os.environ.get('REGION', 'us-east-2')
-    return get_secret(secret_name, region)
+    return get_keys()['openai']
 
 
 def get_openrouter_key() -> Optional[str]:
     """Get OpenRouter API key from Secrets Manager"""
-    secret_name = os.environ.get('OPENROUTER_SECRET_NAME', 'openrouter-api-key')
-    region = os.environ.get('REGION', 'us-east-2')
-    return get_secret(secret_name, region)
-
+    return get_keys()['openrouter']
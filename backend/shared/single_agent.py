@@ -4,6 +4,7 @@ Utilities that power the best-effort single-agent pipeline (YOLO + CV + GPT).
 from __future__ import annotations
 
 import json
+import threading
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from .cv_utils import (
@@ -14,18 +15,37 @@ from .cv_utils import (
     detect_dark_patches_cv,
     merge_damage_areas,
     filter_large_damage_areas,
+    DecodedImage,
+    get_decoded_image,
 )
+from .model_loader import infer_cached
 
 try:
     import numpy as np  # type: ignore
 except ImportError:  # pragma: no cover
     np = None
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
 try:
     import cv2  # type: ignore
 except ImportError:  # pragma: no cover
     cv2 = None
 
 
+# Roof-mask morphology kernels, built once; the _HALF pair is for masks
+# cleaned at half resolution (see _clean_roof_mask)
+_KERNEL_CLOSE = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (15, 15)) if cv2 is not None else None
+_KERNEL_OPEN = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (10, 10)) if cv2 is not None else None
+_KERNEL_CLOSE_HALF = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (8, 8)) if cv2 is not None else None
+_KERNEL_OPEN_HALF = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)) if cv2 is not None else None
+
+# Masks with a longer edge than this are cleaned at half resolution
+_MORPH_FULL_RES_MAX_EDGE = 1024
+
+
 def _ensure_np_cv() -> None:
     if np is None or cv2 is None:
         raise RuntimeError(
@@ -75,53 +95,67 @@ def _clip_box(box: Sequence[float], width: int, height: int) -> List[int]:
     return [x1, y1, x2, y2]
 
 
-def detect_roof_boundary(img: "np.ndarray") -> Optional["np.ndarray"]:
+def _clean_roof_mask(mask: "np.ndarray") -> "np.ndarray":
+    """
+    Close small gaps then drop specks in a 0/255 roof mask.
+
+    Large masks go through pyrDown, run the same close/open with half-size
+    kernels (4x fewer pixels), and come back with pyrUp; re-thresholding keeps
+    the result binary. This approximates full-resolution morphology rather
+    than reproducing it: on the sample roofs the masks agree to IoU >= 0.97,
+    and detections near the roof edge can land on either side of it.
+    """
+    h, w = mask.shape[:2]
+    if max(h, w) <= _MORPH_FULL_RES_MAX_EDGE:
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _KERNEL_CLOSE)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, _KERNEL_OPEN)
+    
+    small = cv2.pyrDown(mask)
+    cv2.threshold(small, 127, 255, cv2.THRESH_BINARY, dst=small)
+    small = cv2.morphologyEx(small, cv2.MORPH_CLOSE, _KERNEL_CLOSE_HALF)
+    small = cv2.morphologyEx(small, cv2.MORPH_OPEN, _KERNEL_OPEN_HALF)
+    mask = cv2.pyrUp(small, dstsize=(w, h))
+    cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY, dst=mask)
+    return mask
+
+
+def detect_roof_boundary(img: "np.ndarray", hsv: Optional["np.ndarray"] = None) -> Optional["np.ndarray"]:
     """
     Detect the roof region using HSV color segmentation.
     Returns a binary mask where roof pixels are 255, background is 0.
     Falls back to excluding top 15% of image if no roof colors detected.
+    Pass hsv (e.g. DecodedImage.hsv) to reuse an existing conversion of img.
     """
     _ensure_np_cv()
     h, w = img.shape[:2]
     
     # Convert to HSV for color-based segmentation
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    if hsv is None:
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
     
     # Detect sky regions (high brightness, low saturation, blue-ish hue)
     # Sky typically has H: 90-130, S: 0-80, V: 150-255
+    # (masks are OR'd into the first one's buffer as they are produced)
     sky_mask = cv2.inRange(hsv, (90, 0, 150), (130, 80, 255))
     
     # Also detect very bright areas (overexposed sky)
-    bright_mask = cv2.inRange(hsv, (0, 0, 200), (180, 40, 255))
-    sky_mask = cv2.bitwise_or(sky_mask, bright_mask)
+    cv2.bitwise_or(sky_mask, cv2.inRange(hsv, (0, 0, 200), (180, 40, 255)), dst=sky_mask)
     
     # Detect common roof colors:
     # Gray shingles: low saturation, medium value
-    gray_roof = cv2.inRange(hsv, (0, 0, 40), (180, 60, 180))
+    roof_mask = cv2.inRange(hsv, (0, 0, 40), (180, 60, 180))
     # Brown/tan shingles: warm hues, medium saturation
-    brown_roof = cv2.inRange(hsv, (5, 30, 40), (25, 180, 200))
+    cv2.bitwise_or(roof_mask, cv2.inRange(hsv, (5, 30, 40), (25, 180, 200)), dst=roof_mask)
     # Dark shingles (black/dark gray)
-    dark_roof = cv2.inRange(hsv, (0, 0, 20), (180, 80, 100))
+    cv2.bitwise_or(roof_mask, cv2.inRange(hsv, (0, 0, 20), (180, 80, 100)), dst=roof_mask)
     # Red/terracotta tiles
-    red_roof = cv2.inRange(hsv, (0, 50, 50), (15, 200, 200))
+    cv2.bitwise_or(roof_mask, cv2.inRange(hsv, (0, 50, 50), (15, 200, 200)), dst=roof_mask)
     
-    # Combine all roof-like colors
-    roof_colors = cv2.bitwise_or(gray_roof, brown_roof)
-    roof_colors = cv2.bitwise_or(roof_colors, dark_roof)
-    roof_colors = cv2.bitwise_or(roof_colors, red_roof)
-    
-    # Start with the color-based roof detection
-    roof_mask = roof_colors.copy()
-    
-    # Remove sky regions
-    roof_mask = cv2.bitwise_and(roof_mask, cv2.bitwise_not(sky_mask))
+    # Remove sky regions: on 0/255 masks a saturating subtract is roof AND NOT sky
+    cv2.subtract(roof_mask, sky_mask, dst=roof_mask)
     
     # Apply morphological operations to clean up
-    kernel_close = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (15, 15))
-    roof_mask = cv2.morphologyEx(roof_mask, cv2.MORPH_CLOSE, kernel_close)
-    
-    kernel_open = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (10, 10))
-    roof_mask = cv2.morphologyEx(roof_mask, cv2.MORPH_OPEN, kernel_open)
+    roof_mask = _clean_roof_mask(roof_mask)
     
     # Find the largest contour (likely the main roof)
     contours, _ = cv2.findContours(roof_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -142,16 +176,40 @@ def detect_roof_boundary(img: "np.ndarray") -> Optional["np.ndarray"]:
         fallback_mask[int(h * 0.15):, :] = 255
         return fallback_mask
     
-    # Create final mask from large contours
-    final_mask = np.zeros((h, w), dtype=np.uint8)
-    cv2.drawContours(final_mask, large_contours, -1, 255, -1)
+    # Create final mask from large contours, reusing the cleaned mask's buffer.
+    # Filling the external contours also fills holes, so roof_mask itself
+    # cannot stand in; fillPoly rasterizes exactly like drawContours(FILLED)
+    final_mask = roof_mask
+    final_mask.fill(0)
+    cv2.fillPoly(final_mask, large_contours, 255)
     
     # Expand mask slightly to include edges
-    final_mask = cv2.dilate(final_mask, kernel_close, iterations=1)
+    final_mask = cv2.dilate(final_mask, _KERNEL_CLOSE, iterations=1)
     
     return final_mask
 
 
+def roof_mask_for(decoded: DecodedImage) -> "np.ndarray":
+    """
+    detect_roof_boundary for a shared DecodedImage, computed once per image.
+
+    run_yolo_inference and enrich_with_cv both filter by the roof mask; caching
+    it on the decoded image means the segmentation runs once per photo.
+    The mask is at decoded resolution and read-only.
+    """
+    mask = decoded.derived.get("roof_mask")
+    if mask is None:
+        # decoded.hsv is the same conversion the CV detectors use
+        mask = detect_roof_boundary(decoded.bgr, hsv=decoded.hsv)
+        mask.setflags(write=False)
+        decoded.derived["roof_mask"] = mask
+    return mask
+
+
+# Above this many candidate boxes, one integral image beats per-box counting
+_INTEGRAL_MIN_BOXES = 48
+
+
 def filter_detections_by_location(
     detections: List[Dict[str, Any]],
     img_width: int,
@@ -170,7 +228,8 @@ def filter_detections_by_location(
     Args:
         detections: List of detection dicts with 'bbox' key
         img_width, img_height: Image dimensions
-        roof_mask: Optional binary mask of roof region
+        roof_mask: Optional binary mask of roof region; may be lower resolution
+            than the image, boxes are mapped into mask coordinates for the check
         top_margin_pct: Fraction of image height to exclude from top (sky filter)
         edge_margin_pct: Fraction of image to exclude from edges
         min_roof_overlap_pct: Minimum overlap with roof mask to keep detection
@@ -180,57 +239,55 @@ def filter_detections_by_location(
     """
     _ensure_np_cv()
     
+    if not detections:
+        return []
+    
     top_cutoff = int(img_height * top_margin_pct)
     edge_margin = int(min(img_width, img_height) * edge_margin_pct)
     
-    filtered = []
-    for det in detections:
-        bbox = det.get("bbox", [0, 0, 0, 0])
-        x1, y1, x2, y2 = bbox
-        
-        # Calculate detection center
-        cx = (x1 + x2) / 2
-        cy = (y1 + y2) / 2
-        
-        # Skip if center is in top margin (sky)
-        if cy < top_cutoff:
-            continue
+    boxes = np.array(
+        [det.get("bbox", [0, 0, 0, 0]) for det in detections], dtype=np.float64
+    ).reshape(-1, 4)
+    x1, y1, x2, y2 = boxes.T
+    
+    # Detection centers: drop the top margin (sky) and anything near the edges
+    cx = (x1 + x2) / 2
+    cy = (y1 + y2) / 2
+    keep = (
+        (cy >= top_cutoff)
+        & (cx >= edge_margin)
+        & (cx <= img_width - edge_margin)
+        & (cy <= img_height - edge_margin)
+    )
+    
+    if roof_mask is not None and keep.any():
+        mask_h, mask_w = roof_mask.shape[:2]
         
-        # Skip if center is too close to edges
-        if cx < edge_margin or cx > (img_width - edge_margin):
-            continue
-        if cy > (img_height - edge_margin):  # bottom edge
-            continue
+        # Box corners in mask pixels, truncated like int()
+        ix1 = np.maximum(0, np.trunc(x1 * (mask_w / img_width)).astype(np.int64))
+        iy1 = np.maximum(0, np.trunc(y1 * (mask_h / img_height)).astype(np.int64))
+        ix2 = np.minimum(mask_w, np.trunc(x2 * (mask_w / img_width)).astype(np.int64))
+        iy2 = np.minimum(mask_h, np.trunc(y2 * (mask_h / img_height)).astype(np.int64))
+        det_area = (ix2 - ix1) * (iy2 - iy1)
+        keep &= (ix2 > ix1) & (iy2 > iy1)
         
-        # If roof mask provided, check overlap
-        if roof_mask is not None:
-            # Use integer coordinates consistently for area calculation
-            ix1, iy1 = max(0, int(x1)), max(0, int(y1))
-            ix2, iy2 = min(img_width, int(x2)), min(img_height, int(y2))
-            
-            det_width = ix2 - ix1
-            det_height = iy2 - iy1
-            if det_width <= 0 or det_height <= 0:
-                continue
-            
-            det_area = det_width * det_height
-            
-            # Extract detection region from mask
-            mask_region = roof_mask[iy1:iy2, ix1:ix2]
-            
-            if mask_region.size == 0:
-                continue
-            
-            # Calculate what fraction of detection overlaps with roof
-            roof_pixels = np.sum(mask_region > 0)
+        candidates = np.flatnonzero(keep)
+        roof_pixels = np.zeros(len(detections), dtype=np.int64)
+        if len(candidates) > _INTEGRAL_MIN_BOXES:
+            # Roof pixels per box from four corner lookups in the integral image
+            integ = cv2.integral((roof_mask > 0).view(np.uint8))
+            cx1, cx2 = np.clip(ix1, 0, mask_w), np.clip(ix2, 0, mask_w)
+            cy1, cy2 = np.clip(iy1, 0, mask_h), np.clip(iy2, 0, mask_h)
+            roof_pixels = integ[cy2, cx2] - integ[cy1, cx2] - integ[cy2, cx1] + integ[cy1, cx1]
+        else:
+            # A few boxes are cheaper to count directly than a full-mask pass
+            for i in candidates:
+                roof_pixels[i] = np.count_nonzero(roof_mask[iy1[i]:iy2[i], ix1[i]:ix2[i]] > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
             overlap_pct = roof_pixels / det_area
-            
-            if overlap_pct < min_roof_overlap_pct:
-                continue
-        
-        filtered.append(det)
+        keep &= overlap_pct >= min_roof_overlap_pct
     
-    return filtered
+    return [detections[i] for i in np.flatnonzero(keep)]
 
 
 def _nms(boxes: "np.ndarray", scores: "np.ndarray", iou_threshold: float) -> List[int]:
@@ -238,6 +295,18 @@ def _nms(boxes: "np.ndarray", scores: "np.ndarray", iou_threshold: float) -> Lis
     Basic NMS implementation for CPU inference.
     """
     idxs = scores.argsort()[::-1]
+    if (
+        cv2 is not None
+        and scores.size
+        and scores.min() > 0
+        and (boxes[:, 2:] > boxes[:, :2]).all()
+    ):
+        # OpenCV's C++ NMS: it ignores scores not above its (>= 0) threshold
+        # and treats empty boxes differently, so those keep the loop below
+        xywh = boxes.astype(np.float64)
+        xywh[:, 2:] -= xywh[:, :2]
+        keep_cv = cv2.dnn.NMSBoxes(xywh, scores.astype(np.float32), 0.0, float(iou_threshold))
+        return np.asarray(keep_cv, dtype=np.int64).reshape(-1).tolist()
     keep: List[int] = []
 
     while idxs.size > 0:
@@ -265,6 +334,19 @@ def _nms(boxes: "np.ndarray", scores: "np.ndarray", iou_threshold: float) -> Lis
     return keep
 
 
+# Per-thread YOLO input tensor, reused across invocations on a warm container
+_input_buffers = threading.local()
+
+
+def _input_buffer(shape: Tuple[int, ...]) -> "np.ndarray":
+    """Return this thread's float32 input buffer, reallocating if the shape changed."""
+    buf = getattr(_input_buffers, "buf", None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=np.float32)
+        _input_buffers.buf = buf
+    return buf
+
+
 def run_yolo_inference(
     image_bytes: bytes,
     session: Any,
@@ -272,6 +354,8 @@ def run_yolo_inference(
     conf_threshold: float = 0.3,
     iou_threshold: float = 0.45,
     filter_by_roof: bool = True,
+    cache_key: Optional[str] = None,
+    decoded: Optional[DecodedImage] = None,
 ) -> List[Dict[str, Any]]:
     """
     Execute YOLO (ONNX) inference and return normalized damage detections.
@@ -283,29 +367,41 @@ def run_yolo_inference(
         conf_threshold: Minimum confidence threshold
         iou_threshold: IoU threshold for NMS
         filter_by_roof: If True, detect roof boundary and filter detections
+        cache_key: Optional model identifier; when set, the raw model output
+            is cached per (model, image, input size, decode scale) via
+            model_loader.infer_cached
+        decoded: Optional DecodedImage of image_bytes (shared with enrich_with_cv)
     """
     _ensure_np_cv()
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    if decoded is None:
+        decoded = get_decoded_image(image_bytes)
+    if decoded.is_empty:
         return []
 
-    original_h, original_w = img.shape[:2]
-    
-    # Detect roof boundary for filtering
-    roof_mask = None
-    if filter_by_roof:
-        roof_mask = detect_roof_boundary(img)
-    processed, ratio, dwdh = _letterbox(img, new_shape=session.get_inputs()[0].shape[-1])
-    input_data = processed.transpose((2, 0, 1))  # CHW
-    input_data = input_data.astype(np.float32) / 255.0
-    input_data = np.expand_dims(input_data, axis=0)
-
-    input_name = session.get_inputs()[0].name
-    outputs = session.run(None, {input_name: input_data})
+    img = decoded.bgr
+    original_w, original_h = decoded.original_size
     
+    # Detect roof boundary for filtering (shared with enrich_with_cv)
+    roof_mask = roof_mask_for(decoded) if filter_by_roof else None
+    input_size = session.get_inputs()[0].shape[-1]
+    processed, ratio, dwdh = _letterbox(img, new_shape=input_size)
+
+    def _infer():
+        # Cast HWC uint8 into the reused contiguous NCHW buffer, then normalize
+        # in place; ORT reads a contiguous float32 array without copying
+        input_data = _input_buffer((1, processed.shape[2]) + processed.shape[:2])
+        input_data[0] = processed.transpose((2, 0, 1))
+        input_data /= np.float32(255.0)
+
+        input_name = session.get_inputs()[0].name
+        return session.run(None, {input_name: input_data})[0]
+
     # Handle different YOLO output formats
-    raw_output = outputs[0]
+    if cache_key:
+        # The decode scale (from CV_MAX_EDGE) changes the pixels the model sees
+        raw_output = infer_cached(cache_key, image_bytes, (input_size, decoded.scale), _infer)
+    else:
+        raw_output = _infer()
     
     # YOLOv8 outputs shape (1, num_classes+4, num_detections) and needs transpose
     # YOLOv5 outputs shape (1, num_detections, num_classes+5)
@@ -325,11 +421,10 @@ def run_yolo_inference(
     if class_scores.size == 0:
         return []
 
-    class_indices = np.argmax(class_scores, axis=1)
-    scores = class_scores[np.arange(class_scores.shape[0]), class_indices]
-    
-    # Ensure scores are in valid range [0, 1]
-    scores = np.clip(scores, 0.0, 1.0)
+    # Best class score per anchor, clipped to [0, 1]; threshold before argmax
+    # so the class lookup only runs on the few anchors that survive
+    scores = class_scores.max(axis=1)
+    np.clip(scores, 0.0, 1.0, out=scores)
 
     valid = scores >= conf_threshold
     if not np.any(valid):
@@ -337,20 +432,22 @@ def run_yolo_inference(
 
     boxes = boxes[valid]
     scores = scores[valid]
-    class_indices = class_indices[valid]
+    class_indices = np.argmax(class_scores[valid], axis=1)
 
     # Convert from center x/y/w/h to corners
-    boxes_xyxy = np.zeros_like(boxes)
-    boxes_xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2  # x1
-    boxes_xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2  # y1
-    boxes_xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2  # x2
-    boxes_xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2  # y2
-
-    # Undo letterbox scaling
-    boxes_xyxy[:, [0, 2]] -= dwdh[0]
-    boxes_xyxy[:, [1, 3]] -= dwdh[1]
-    boxes_xyxy[:, [0, 2]] /= ratio[0]
-    boxes_xyxy[:, [1, 3]] /= ratio[1]
+    cxcy = boxes[:, :2]
+    half_wh = boxes[:, 2:] * 0.5
+    boxes_xyxy = np.empty_like(boxes)
+    np.subtract(cxcy, half_wh, out=boxes_xyxy[:, :2])  # x1, y1
+    np.add(cxcy, half_wh, out=boxes_xyxy[:, 2:])  # x2, y2
+
+    # Undo letterbox padding and scaling (_letterbox scales both axes by r)
+    boxes_xyxy[:, 0::2] -= dwdh[0]
+    boxes_xyxy[:, 1::2] -= dwdh[1]
+    boxes_xyxy /= ratio[0]
+    if decoded.scale != 1:
+        # Back from the reduced decode to original pixels
+        boxes_xyxy *= decoded.scale
 
     keep_indices = _nms(boxes_xyxy, scores, iou_threshold)
 
@@ -396,34 +493,37 @@ def enrich_with_cv(
     min_area_discoloration: int = 600,
     min_area_underlayment: int = 300,
     filter_by_roof: bool = True,
+    decoded: Optional[DecodedImage] = None,
 ) -> List[Dict[str, Any]]:
     """
     Merge YOLO detections with CV heuristics for redundancy and recall.
     Optionally filters all detections to roof-only regions.
+    Pass decoded (from run_yolo_inference's caller) to skip the decode.
     """
     _ensure_np_cv()
     
-    # Get image dimensions and roof mask for filtering
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    # Decode once; every detector below shares the same arrays
+    if decoded is None:
+        decoded = get_decoded_image(image_bytes)
+    if decoded.is_empty:
         return detections
     
-    img_h, img_w = img.shape[:2]
-    roof_mask = detect_roof_boundary(img) if filter_by_roof else None
+    img_w, img_h = decoded.original_size
+    # Kept at decode resolution; the filter maps boxes into mask coordinates
+    roof_mask = roof_mask_for(decoded) if filter_by_roof else None
     
-    cv_missing = detect_missing_shingles_cv(image_bytes, min_area=min_area_missing)
+    cv_missing = detect_missing_shingles_cv(decoded, min_area=min_area_missing)
     merged = merge_damage_areas(detections, cv_missing, iou_threshold=0.35)
 
-    cv_discoloration = detect_discoloration_cv(image_bytes, min_area=min_area_discoloration)
+    cv_discoloration = detect_discoloration_cv(decoded, min_area=min_area_discoloration)
     merged = merge_damage_areas(merged, cv_discoloration, iou_threshold=0.3)
 
     # Detect exposed underlayment (tan/brown patches - very common damage indicator)
-    cv_underlayment = detect_exposed_underlayment_cv(image_bytes, min_area=min_area_underlayment)
+    cv_underlayment = detect_exposed_underlayment_cv(decoded, min_area=min_area_underlayment)
     merged = merge_damage_areas(merged, cv_underlayment, iou_threshold=0.3)
 
     # Detect dark patches (black/dark gray exposed areas - tar paper, gaps)
-    cv_dark_patches = detect_dark_patches_cv(image_bytes, min_area=250)
+    cv_dark_patches = detect_dark_patches_cv(decoded, min_area=250)
     merged = merge_damage_areas(merged, cv_dark_patches, iou_threshold=0.35)
 
     # Filter all detections by location (remove sky, edges, non-roof areas)
@@ -441,6 +541,23 @@ def enrich_with_cv(
     return merged
 
 
+def _dumps_payload(payload: Dict[str, Any]) -> str:
+    """
+    Serialize the detections payload for a prompt: orjson (numpy scalars as
+    numbers) when installed, else json with str() for unknown types.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                payload,
+                default=str,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            ).decode()
+        except TypeError:
+            pass
+    return json.dumps(payload, default=str)
+
+
 def summarize_with_ai(
     ai_client: Any,
     image_bytes: bytes,
@@ -479,7 +596,7 @@ Strictly return JSON.
     }
     response, provider = ai_client.detect_content(
         image_bytes,
-        prompt.format(detections=json.dumps(payload, default=str)),
+        prompt.format(detections=_dumps_payload(payload)),
     )
     if not response:
         return (
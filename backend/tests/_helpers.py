@@ -0,0 +1,32 @@
+"""
+Helpers shared by the test modules (conftest.py only sets up the session).
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_lambda_handler(lambda_dir: str, module_name: str):
+    """
+    Load lambda/<lambda_dir>/handler.py as module_name.
+
+    Several Lambdas define handler.py, so each is loaded by path under its own
+    name and registered in sys.modules before executing; repeat loads (and
+    imports inside the handler) then resolve to that module instead of
+    re-running handler.py.
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    module_path = BACKEND_ROOT / 'lambda' / lambda_dir / 'handler.py'
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[module_name]
+        raise
+    return module
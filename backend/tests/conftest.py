@@ -0,0 +1,31 @@
+"""
+Shared pytest setup: put the backend root and the Lambda source directories
+the tests import from on sys.path once per session.
+"""
+import sys
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - image tests will report it
+    Image = None
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+# Lambda handlers all live in a file named handler.py, so tests load them by
+# path (tests/_helpers.py) instead of through sys.path
+_IMPORT_PATHS = (
+    BACKEND_ROOT / 'lambda' / 'agent-single',
+    BACKEND_ROOT,
+)
+
+for _path in _IMPORT_PATHS:
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
+
+
+# Register the JPEG/PNG codecs up front so the first image test doesn't pay
+# for it. The full plugin scan stays lazy: validate_image relies on it to name
+# unsupported formats.
+if Image is not None:
+    Image.preinit()
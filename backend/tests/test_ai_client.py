@@ -1,60 +1,79 @@
 """
 Unit tests for AI client
 """
-import unittest
+import copy
+import hashlib
 from unittest.mock import Mock, patch, MagicMock
-import sys
-import os
 
-# Add parent directory to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'content-detection'))
+import pytest
 
 from ai_client import AIClient
 
 
-class TestAIClient(unittest.TestCase):
-    """Test cases for AIClient"""
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        with patch('ai_client.get_openai_key', return_value='test-openai-key'), \
-             patch('ai_client.get_openrouter_key', return_value='test-openrouter-key'), \
-             patch('ai_client.OpenAI'):
-            self.client = AIClient()
-    
-    def test_encode_image(self):
-        """Test image encoding"""
-        image_bytes = b'test image data'
-        encoded = self.client._encode_image(image_bytes)
-        self.assertIsInstance(encoded, str)
-        self.assertGreater(len(encoded), 0)
-    
-    @patch('ai_client.get_cached_response')
-    @patch('ai_client.set_cached_response')
-    def test_cache_hit(self, mock_set_cache, mock_get_cache):
-        """Test cache hit scenario"""
-        cached_result = {'detections': [], 'materials': []}
-        mock_get_cache.return_value = cached_result
-        
-        result, provider = self.client.detect_content(b'test', 'test prompt')
-        
-        self.assertEqual(result, cached_result)
-        self.assertEqual(provider, 'cache')
-        mock_get_cache.assert_called_once()
-        mock_set_cache.assert_not_called()
-    
-    def test_circuit_breaker(self):
-        """Test circuit breaker functionality"""
-        # Simulate failures
-        self.client.circuit_breaker_failures = 3
-        self.client.circuit_breaker_open = True
-        
-        # Should skip OpenAI and go to OpenRouter
-        with patch.object(self.client, '_call_openrouter', return_value={'test': 'data'}):
-            result, provider = self.client.detect_content(b'test', 'test prompt')
-            self.assertEqual(provider, 'openrouter')
-
-
-if __name__ == '__main__':
-    unittest.main()
+@pytest.fixture(scope='module')
+def template_client():
+    """Build one client with patched secrets for the whole module"""
+    with patch.multiple(
+        'ai_client',
+        get_openai_key=Mock(return_value='test-openai-key'),
+        get_openrouter_key=Mock(return_value='test-openrouter-key'),
+        OpenAI=MagicMock(),
+    ):
+        yield AIClient()
 
+
+@pytest.fixture
+def client(template_client):
+    """Give each test a fresh copy with the circuit breaker closed"""
+    client = copy.copy(template_client)
+    client.circuit_breaker_failures = 0
+    client.circuit_breaker_open = False
+    return client
+
+
+@pytest.mark.parametrize('image_bytes,expected', [
+    (b'', ''),
+    (b'test image data', 'dGVzdCBpbWFnZSBkYXRh'),
+], ids=['empty', 'short'])
+def test_encode_image(client, image_bytes, expected):
+    """Test image encoding"""
+    assert client._encode_image(image_bytes) == expected
+
+
+# SHA-256 of the expected base64 text, so large payloads need no literal
+@pytest.mark.parametrize('image_bytes,expected_len,expected_digest', [
+    (b'\xff' * 1024, 1368, '73568bb48569992f0ca35b5eed97a1dc15a2a8d24b17fa8917ebae43e8fa6bba'),
+    (bytes(range(256)) * 256, 87384, 'fa2a8ebb8b426644911e6914c4f02ff3760425f5a3ba5ecb7dc507fb944fbb4e'),
+], ids=['1kb', '64kb'])
+def test_encode_large_image(client, image_bytes, expected_len, expected_digest):
+    """Test encoding of payloads past any line-wrapping limit"""
+    encoded = client._encode_image(image_bytes)
+    assert len(encoded) == expected_len
+    assert hashlib.sha256(encoded.encode('ascii')).hexdigest() == expected_digest
+
+
+@patch('ai_client.get_cached_response')
+@patch('ai_client.set_cached_response')
+def test_cache_hit(mock_set_cache, mock_get_cache, client):
+    """Test cache hit scenario"""
+    cached_result = {'detections': [], 'materials': []}
+    mock_get_cache.return_value = cached_result
+
+    result, provider = client.detect_content(b'test', 'test prompt')
+
+    assert result == cached_result
+    assert provider == 'cache'
+    mock_get_cache.assert_called_once()
+    mock_set_cache.assert_not_called()
+
+
+def test_circuit_breaker(client):
+    """Test circuit breaker functionality"""
+    # Simulate failures
+    client.circuit_breaker_failures = 3
+    client.circuit_breaker_open = True
+
+    # Should skip OpenAI and go to OpenRouter
+    with patch.object(client, '_call_openrouter', return_value={'test': 'data'}):
+        result, provider = client.detect_content(b'test', 'test prompt')
+        assert provider == 'openrouter'
@@ -1,6 +1,16 @@
+import copy
+import io
 import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
 from shared import cv_utils
 
 ROOT = Path(__file__).resolve().parents[2]
@@ -8,23 +18,208 @@ ROOF_DIR = ROOT / 'test-data' / 'roofs'
 LABELS = json.loads((ROOF_DIR / 'labels.json').read_text())
 
 
+@lru_cache(maxsize=None)
 def _load_image(name: str) -> bytes:
     return (ROOF_DIR / name).read_bytes()
 
 
-def test_detect_missing_shingles_cv_matches_labels():
+@pytest.mark.parametrize('filename,meta', list(LABELS.items()), ids=list(LABELS))
+def test_detect_missing_shingles_cv_matches_labels(filename, meta):
     """Ensure CV detector finds boxes overlapping each labeled patch."""
-    for filename, meta in LABELS.items():
-        image_bytes = _load_image(filename)
-        detections = cv_utils.detect_missing_shingles_cv(image_bytes, min_area=400)
-        detected_bboxes = [det.get('bbox') for det in detections if det.get('bbox')]
-        assert detected_bboxes, f"No detections for {filename}"
-
-        for truth_bbox in meta['bboxes']:
-            overlaps = [
-                cv_utils.calculate_overlap(truth_bbox, det_bbox)
-                for det_bbox in detected_bboxes
-            ]
-            assert any(iou > 0.05 for iou in overlaps), (
-                f"Failed to find detection overlapping labeled patch {truth_bbox} in {filename}"
-            )
+    image_bytes = _load_image(filename)
+    detections = cv_utils.detect_missing_shingles_cv(image_bytes, min_area=400)
+    detected_bboxes = [det.get('bbox') for det in detections if det.get('bbox')]
+    assert detected_bboxes, f"No detections for {filename}"
+
+    # One IoU row per labeled patch; each needs at least one overlapping detection
+    matched = (cv_utils.calculate_overlap_matrix(meta['bboxes'], detected_bboxes) > 0.05).any(axis=1)
+    missed = [bbox for bbox, hit in zip(meta['bboxes'], matched) if not hit]
+    assert not missed, (
+        f"Failed to find detection overlapping labeled patches {missed} in {filename}"
+    )
+
+
+def test_calculate_overlap_matrix_matches_pairwise_overlap():
+    """Vectorized IoU must agree with the scalar helper, including degenerate boxes."""
+    boxes_a = [[0, 0, 10, 10], [5, 5, 15, 15], [0, 0, 0, 0], [20, 20, 10, 10]]
+    boxes_b = [[0, 0, 10, 10], [8, 0, 30, 12], [100, 100, 110, 110]]
+    matrix = cv_utils.calculate_overlap_matrix(boxes_a, boxes_b)
+
+    assert matrix.shape == (len(boxes_a), len(boxes_b))
+    for i, box_a in enumerate(boxes_a):
+        for j, box_b in enumerate(boxes_b):
+            assert abs(matrix[i, j] - cv_utils.calculate_overlap(box_a, box_b)) < 1e-9
+
+
+def test_detectors_accept_shared_decoded_image():
+    image_bytes = _load_image('roof1.png')
+    decoded = cv_utils.get_decoded_image(image_bytes)
+
+    assert cv_utils.get_decoded_image(image_bytes) is decoded
+    assert not decoded.hsv.flags.writeable
+    assert cv_utils.detect_dark_patches_cv(decoded) == cv_utils.detect_dark_patches_cv(image_bytes)
+
+
+def test_reduced_decode_maps_bboxes_to_original_pixels():
+    image_bytes = _load_image('roof_sample_01.png')
+    full = cv_utils.get_decoded_image(image_bytes, max_edge=0)
+    reduced = cv_utils.get_decoded_image(image_bytes, max_edge=512)
+
+    assert reduced.scale == 2
+    assert reduced.original_size == full.original_size
+    width, height = full.original_size
+    for det in cv_utils.detect_missing_shingles_cv(reduced, min_area=400):
+        x1, y1, x2, y2 = det['bbox']
+        assert 0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height
+
+
+def test_detector_results_are_memoized_as_independent_copies():
+    image_bytes = _load_image('roof2.png')
+    first = cv_utils.detect_exposed_underlayment_cv(image_bytes)
+    assert first
+    first[0]['bbox'][0] = -1
+    first[0]['damage_type'] = 'mutated'
+
+    second = cv_utils.detect_exposed_underlayment_cv(image_bytes)
+    assert second[0]['bbox'][0] != -1
+    assert second[0]['damage_type'] == 'exposed_underlayment'
+
+
+def _reference_merge(primary, secondary, iou_threshold=0.4):
+    """The original O(n*m) merge: compare each candidate with every merged entry."""
+    merged = [dict(area) for area in primary]
+    for candidate in secondary:
+        bbox = candidate.get('bbox')
+        if not bbox or len(bbox) != 4:
+            continue
+        best_match, best_iou = None, 0.0
+        for existing in merged:
+            existing_bbox = existing.get('bbox', [])
+            if len(existing_bbox) != 4:
+                continue
+            iou = cv_utils.calculate_overlap(existing_bbox, bbox)
+            if iou > best_iou:
+                best_match, best_iou = existing, iou
+        if best_match and best_iou >= iou_threshold:
+            if candidate.get('confidence', 0) > best_match.get('confidence', 0):
+                best_match.update(candidate)
+        else:
+            merged.append(candidate)
+    return merged
+
+
+def _random_areas(rng, count, source):
+    areas = []
+    for _ in range(count):
+        x1, y1 = rng.randint(0, 1800), rng.randint(0, 1200)
+        w, h = rng.randint(4, 160), rng.randint(4, 160)
+        areas.append({'bbox': [x1, y1, x1 + w, y1 + h], 'confidence': rng.random(), 'source': source})
+    return areas
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_merge_damage_areas_matches_pairwise_merge(seed):
+    """The spatial-grid merge must keep exactly what the all-pairs merge keeps."""
+    rng = random.Random(seed)
+    primary = _random_areas(rng, 60, 'cv')
+    primary.append({'confidence': 0.9})  # no bbox: never matched
+    primary.append({'bbox': [0, 0, 4000, 3000], 'confidence': 0.1})  # spans too many grid cells
+    secondary = _random_areas(rng, 200, 'ai')
+    secondary.append({'bbox': [1, 2, 3], 'confidence': 1.0})  # malformed: skipped
+
+    # Chains: each step overlaps the previous one enough to merge, and the higher
+    # confidence moves the merged box, so later steps only match the moved box
+    for start in range(3):
+        x, y = rng.randint(0, 1500), rng.randint(0, 1000)
+        primary.append({'bbox': [x, y, x + 100, y + 100], 'confidence': 0.1, 'source': 'chain'})
+        for step in range(1, 8):
+            dx = 25 * step
+            secondary.append({
+                'bbox': [x + dx, y, x + dx + 100, y + 100],
+                'confidence': 0.1 + 0.1 * step,
+                'source': f'chain-{start}-{step}',
+            })
+
+    # Both merges update appended secondary dicts in place, so each gets its own copy
+    expected = _reference_merge(copy.deepcopy(primary), copy.deepcopy(secondary))
+    assert cv_utils.merge_damage_areas(primary, secondary) == expected
+
+
+def _decode(data: bytes):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+
+
+def test_enhance_colors_returns_same_size_jpeg():
+    image_bytes = _load_image('roof1.png')
+    enhanced = cv_utils.enhance_colors(image_bytes)
+
+    assert enhanced[:3] == b'\xff\xd8\xff'
+    original, result = _decode(image_bytes), _decode(enhanced)
+    assert result.dtype == np.uint8
+    assert result.shape == original.shape[:2] + (3,)
+
+
+@pytest.mark.parametrize('env_value,quality', [('30', 30), ('95', 95), ('500', 100), ('-4', 1), ('high', 85)])
+def test_enhance_colors_quality_from_env(monkeypatch, env_value, quality):
+    """ENHANCE_JPEG_Q is clamped to 1-100 and falls back to 85 when malformed."""
+    image_bytes = _load_image('roof1.png')
+    monkeypatch.setenv('ENHANCE_JPEG_Q', env_value)
+    assert cv_utils.enhance_colors(image_bytes) == cv_utils.enhance_colors(image_bytes, jpeg_quality=quality)
+
+
+def test_generate_overlay_png8_is_palette_with_transparency():
+    image_bytes = _load_image('roof1.png')
+    areas = [{'bbox': [40, 60, 200, 220], 'damage_type': 'hail'}]
+    overlay = Image.open(io.BytesIO(cv_utils.generate_overlay(image_bytes, areas, image_format='PNG8')))
+    rgba = Image.open(io.BytesIO(cv_utils.generate_overlay(image_bytes, areas)))
+
+    assert overlay.format == 'PNG'
+    assert overlay.mode == 'P'
+    assert 'transparency' in overlay.info  # alpha carried in the tRNS chunk
+    assert len(overlay.getcolors(256)) <= 64
+    assert rgba.mode == 'RGBA'
+    assert overlay.size == rgba.size == Image.open(io.BytesIO(image_bytes)).size
+
+
+class _StubAIClient:
+    """Returns canned detect_content results in order and records the prompts."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.prompts = []
+
+    def detect_content(self, image_bytes, prompt):
+        self.prompts.append(prompt)
+        return self.results.pop(0), 'stub'
+
+
+@pytest.mark.parametrize('result', [None, {}, {'classifications': []}, ['not', 'a', 'dict']],
+                         ids=['none', 'no-key', 'empty', 'list'])
+def test_annotate_damage_with_ai_skips_unusable_results(result):
+    areas = [{'bbox': [1, 2, 30, 40], 'damage_type': 'missing_shingles'}]
+    annotated = cv_utils.annotate_damage_with_ai(b'img', areas, _StubAIClient(result))
+    assert annotated == [{'bbox': [1, 2, 30, 40], 'damage_type': 'missing_shingles'}]
+
+
+def test_annotate_damage_with_ai_applies_classifications():
+    client = _StubAIClient({'classifications': [
+        {'bbox': [1, 2, 30, 40], 'damage_type': 'hail_impact', 'severity': 'severe'},
+        {'bbox': [9, 9, 9, 9], 'damage_type': 'cracks'},
+    ]})
+    areas = [{'bbox': [1, 2, 30, 40]}, {'bbox': [50, 50, 80, 90], 'damage_type': 'cracks'}]
+    annotated = cv_utils.annotate_damage_with_ai(b'img', areas, client, task='hail')
+
+    assert annotated[0] == {'bbox': [1, 2, 30, 40], 'damage_type': 'hail_impact', 'severity': 'severe', 'ai_provider': 'stub'}
+    assert annotated[1] == {'bbox': [50, 50, 80, 90], 'damage_type': 'cracks'}
+    assert 'Task: hail' in client.prompts[0]
+
+
+def test_enhance_colors_is_stable_across_threads():
+    """Each thread gets its own CLAHE; concurrent calls match a serial one."""
+    image_bytes = _load_image('roof1.png')
+    expected = cv_utils.enhance_colors(image_bytes)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: cv_utils.enhance_colors(image_bytes), range(12)))
+        clahes = set(pool.map(lambda _: id(cv_utils._clahe()), range(12)))
+    assert all(result == expected for result in results)
+    assert id(cv_utils._clahe()) not in clahes
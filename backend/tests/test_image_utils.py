@@ -1,88 +1,133 @@
 """
 Unit tests for image utilities
 """
-import unittest
-import sys
-import os
-
-# Add parent directory to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from shared.image_utils import validate_image, resize_image_if_needed
-
-
-class TestImageUtils(unittest.TestCase):
-    """Test cases for image utilities"""
-    
-    def test_validate_valid_image(self):
-        """Test validation of valid image"""
-        # Create a simple test image
-        from PIL import Image
-        import io
-        
-        img = Image.new('RGB', (100, 100), color='red')
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='JPEG')
-        img_bytes.seek(0)
-        
-        is_valid, error = validate_image(img_bytes.getvalue())
-        self.assertTrue(is_valid)
-        self.assertIsNone(error)
-    
-    def test_validate_invalid_format(self):
-        """Test validation of invalid image format"""
-        invalid_bytes = b'not an image'
-        
-        is_valid, error = validate_image(invalid_bytes)
-        self.assertFalse(is_valid)
-        self.assertIsNotNone(error)
-    
-    def test_resize_large_image(self):
-        """Test resizing large image"""
-        from PIL import Image
-        import io
-        
-        # Create large image
-        img = Image.new('RGB', (4000, 4000), color='blue')
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='JPEG')
-        img_bytes.seek(0)
-        
-        resized, was_resized = resize_image_if_needed(
-            img_bytes.getvalue(),
-            max_width=2048,
-            max_height=2048
-        )
-        
-        self.assertTrue(was_resized)
-        
-        # Verify new size
-        resized_img = Image.open(io.BytesIO(resized))
-        self.assertLessEqual(resized_img.size[0], 2048)
-        self.assertLessEqual(resized_img.size[1], 2048)
-    
-    def test_no_resize_small_image(self):
-        """Test that small images are not resized"""
-        from PIL import Image
-        import io
-        
-        # Create small image
-        img = Image.new('RGB', (500, 500), color='green')
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='JPEG')
-        img_bytes.seek(0)
-        original_bytes = img_bytes.getvalue()
-        
-        resized, was_resized = resize_image_if_needed(
-            original_bytes,
-            max_width=2048,
-            max_height=2048
-        )
-        
-        self.assertFalse(was_resized)
-        self.assertEqual(len(resized), len(original_bytes))
-
-
-if __name__ == '__main__':
-    unittest.main()
+import io
+import random
 
+import numpy as np
+from PIL import Image
+
+from shared.image_utils import (
+    validate_image,
+    resize_image_if_needed,
+    pixel_to_grid_coords,
+    bbox_to_grid_coords,
+    bbox_to_grid_coords_batch,
+    bbox_intersection,
+    bbox_intersection_matrix,
+    calculate_bbox_area,
+    calculate_bbox_area_batch,
+)
+
+
+def _make_image(size, color, fmt='JPEG', mode='RGB'):
+    """Encode a solid-color test image once."""
+    buffer = io.BytesIO()
+    Image.new(mode, size, color=color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+# Encoded fixtures, built once at import
+_RED_100 = _make_image((100, 100), 'red')
+_BLUE_4000 = _make_image((4000, 4000), 'blue')
+_GREEN_500 = _make_image((500, 500), 'green')
+_RGBA_PNG_3000x1500 = _make_image((3000, 1500), (255, 0, 0, 128), fmt='PNG', mode='RGBA')
+
+
+def test_validate_valid_image():
+    """Test validation of valid image"""
+    is_valid, error = validate_image(_RED_100)
+    assert is_valid
+    assert error is None
+
+
+def test_validate_invalid_format():
+    """Test validation of invalid image format"""
+    is_valid, error = validate_image(b'not an image')
+    assert not is_valid
+    assert error is not None
+
+
+def test_resize_large_image():
+    """Test resizing large image"""
+    resized, was_resized = resize_image_if_needed(
+        _BLUE_4000,
+        max_width=2048,
+        max_height=2048
+    )
+
+    assert was_resized
+
+    # Verify new size
+    resized_img = Image.open(io.BytesIO(resized))
+    assert resized_img.size[0] <= 2048
+    assert resized_img.size[1] <= 2048
+
+
+def test_resize_keeps_png_format():
+    """Test that resized PNGs stay PNG (and keep their alpha channel)"""
+    resized, was_resized = resize_image_if_needed(_RGBA_PNG_3000x1500)
+
+    assert was_resized
+    resized_img = Image.open(io.BytesIO(resized))
+    assert resized_img.format == 'PNG'
+    assert resized_img.mode == 'RGBA'
+    assert resized_img.size == (2048, 1024)
+
+
+def test_no_resize_small_image():
+    """Test that small images are not resized"""
+    resized, was_resized = resize_image_if_needed(
+        _GREEN_500,
+        max_width=2048,
+        max_height=2048
+    )
+
+    assert not was_resized
+    assert len(resized) == len(_GREEN_500)
+
+
+def test_batch_bbox_helpers_match_scalar():
+    """Test batch grid/area helpers agree with the per-box functions"""
+    rng = random.Random(0)
+    bboxes = []
+    for _ in range(200):
+        x1, y1 = rng.randint(0, 1004), rng.randint(0, 767)
+        bboxes.append([x1, y1, x1 + rng.randint(-5, 300), y1 + rng.randint(-5, 300)])
+
+    cells = bbox_to_grid_coords_batch(bboxes, 1005, 767).tolist()
+    areas = calculate_bbox_area_batch(bboxes).tolist()
+    for bbox, (row, col), area in zip(bboxes, cells, areas):
+        assert bbox_to_grid_coords(bbox, 1005, 767) == {"row": row, "col": col}
+        assert calculate_bbox_area(bbox) == area
+
+
+def test_bbox_intersection_matrix_matches_pairwise():
+    """Test the pairwise intersection matrix against bbox_intersection"""
+    boxes_a = [[0, 0, 10, 10], [5, 5, 15, 15], [20, 20, 30, 30]]
+    boxes_b = [[8, 8, 12, 12], [10, 0, 20, 10], [0, 0, 40, 40]]
+
+    inter, valid = bbox_intersection_matrix(boxes_a, boxes_b)
+    assert inter.shape == (3, 3, 4)
+    for i, box_a in enumerate(boxes_a):
+        for j, box_b in enumerate(boxes_b):
+            expected = bbox_intersection(box_a, box_b)
+            assert bool(valid[i, j]) == (expected is not None)
+            if expected is not None:
+                assert inter[i, j].tolist() == expected
+
+
+def test_grid_coords_scalar_and_batch_agree_on_every_pixel():
+    """Brute force: the scalar and batch helpers use one cell formula at any grid size"""
+    for grid_size, width, height in [(10, 1005, 767), (22, 22, 22), (7, 640, 480), (3, 100, 41)]:
+        # Every column with y=0, then every row with x=0, as zero-size boxes
+        pixels = [(x, 0) for x in range(width)] + [(0, y) for y in range(height)]
+        bboxes = np.array([[x, y, x, y] for x, y in pixels])
+        cells = bbox_to_grid_coords_batch(bboxes, width, height, grid_size).tolist()
+        for (x, y), (row, col) in zip(pixels, cells):
+            expected = {
+                "row": min(int((y / height) * grid_size), grid_size - 1),
+                "col": min(int((x / width) * grid_size), grid_size - 1),
+            }
+            assert pixel_to_grid_coords(x, y, width, height, grid_size) == expected
+            assert {"row": row, "col": col} == expected
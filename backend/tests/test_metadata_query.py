@@ -1,71 +1,70 @@
 import json
-import os
-import pathlib
-import importlib.util
-import unittest
-from unittest.mock import MagicMock, patch
-
-
-def load_handler_module():
-    """Dynamically load the metadata query handler module."""
-    module_path = (
-        pathlib.Path(__file__).resolve().parents[1]
-        / "lambda"
-        / "metadata-query"
-        / "handler.py"
-    )
-    spec = importlib.util.spec_from_file_location("metadata_query_handler", module_path)
-    module = importlib.util.module_from_spec(spec)
-    assert spec.loader is not None
-    spec.loader.exec_module(module)
-    return module
-
-
-metadata_query_handler = load_handler_module()
-
-
-class MetadataQueryHandlerTests(unittest.TestCase):
-    def setUp(self):
-        os.environ["DYNAMODB_TABLE_NAME"] = "photos"
-        os.environ["REGION"] = "us-east-2"
-        os.environ["S3_BUCKET_NAME"] = "test-bucket"
-
-    def tearDown(self):
-        os.environ.pop("DYNAMODB_TABLE_NAME", None)
-        os.environ.pop("REGION", None)
-        os.environ.pop("S3_BUCKET_NAME", None)
-
-    @patch.object(metadata_query_handler, "generate_presigned_get_url")
-    @patch.object(metadata_query_handler, "get_metadata")
-    def test_handler_returns_single_agent_fields(self, mock_get_metadata, mock_presign):
-        mock_metadata = MagicMock()
-        mock_metadata.photo_id = "photo-123"
-        mock_metadata.timestamp = "2024-01-01T00:00:00Z"
-        mock_metadata.s3_key = "photos/user/photo-123.jpg"
-        mock_metadata.status = "completed"
-        mock_metadata.detections = []
-        mock_metadata.materials = []
-        mock_metadata.user_id = None
-        mock_metadata.processing_time_ms = 450
-        mock_metadata.ai_provider = "openai"
-        mock_metadata.single_agent_results = {"ai_summary": "summary"}
-        mock_metadata.single_agent_overlay_s3_key = "single-agent/overlay.png"
-        mock_metadata.single_agent_report_s3_key = "single-agent/report.json"
-
-        mock_get_metadata.return_value = mock_metadata
-        mock_presign.side_effect = ["https://single-overlay", "https://single-report"]
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from tests._helpers import load_lambda_handler
+
+
+metadata_query_handler = load_lambda_handler('metadata-query', 'metadata_query_handler')
+
+# Attributes of a completed single-agent photo; cases override what differs
+BASE_METADATA = {
+    "photo_id": "photo-123",
+    "timestamp": "2024-01-01T00:00:00Z",
+    "s3_key": "photos/user/photo-123.jpg",
+    "status": "completed",
+    "detections": [],
+    "materials": [],
+    "user_id": None,
+    "processing_time_ms": 450,
+    "ai_provider": "openai",
+    "single_agent_results": {"ai_summary": "summary"},
+    "single_agent_overlay_s3_key": "single-agent/overlay.png",
+    "single_agent_report_s3_key": "single-agent/report.json",
+}
+
 
+@pytest.fixture(autouse=True)
+def handler_env(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", "photos")
+    monkeypatch.setenv("REGION", "us-east-2")
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+
+
+def _run_handler(presign_side_effect=None, **metadata_overrides):
+    """Run the handler for photo-123 with mocked metadata and presigning."""
+    metadata = SimpleNamespace(**{**BASE_METADATA, **metadata_overrides})
+
+    with patch.object(metadata_query_handler, "get_metadata") as mock_get_metadata, \
+            patch.object(metadata_query_handler, "generate_presigned_get_url") as mock_presign:
+        mock_get_metadata.return_value = metadata
+        mock_presign.side_effect = presign_side_effect
         event = {"pathParameters": {"photoId": "photo-123"}}
         response = metadata_query_handler.handler(event, None)
-        body = json.loads(response["body"])
+    return response, json.loads(response["body"]), mock_presign
 
-        self.assertEqual(body["photo_id"], "photo-123")
-        self.assertNotIn("workflow_status", body)
-        self.assertEqual(body["single_agent_results"]["ai_summary"], "summary")
-        self.assertEqual(body["single_agent_overlay_url"], "https://single-overlay")
-        self.assertEqual(body["single_agent_report_url"], "https://single-report")
 
+def test_handler_returns_single_agent_fields():
+    _, body, _ = _run_handler(
+        presign_side_effect=["https://single-overlay", "https://single-report"],
+    )
 
-if __name__ == "__main__":
-    unittest.main()
+    assert body["photo_id"] == "photo-123"
+    assert "workflow_status" not in body
+    assert body["single_agent_results"]["ai_summary"] == "summary"
+    assert body["single_agent_overlay_url"] == "https://single-overlay"
+    assert body["single_agent_report_url"] == "https://single-report"
+
+
+def test_handler_skips_presign_without_artifacts():
+    response, body, mock_presign = _run_handler(
+        single_agent_overlay_s3_key=None,
+        single_agent_report_s3_key=None,
+    )
 
+    assert response["statusCode"] == 200
+    assert "single_agent_overlay_url" not in body
+    assert "single_agent_report_url" not in body
+    mock_presign.assert_not_called()
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from shared import model_loader
+
+
+def test_infer_cached_reuses_stored_output(tmp_path, monkeypatch):
+    """A repeated (model, image, params) call is served from the SQLite cache."""
+    monkeypatch.setenv('INFERENCE_CACHE_DB', str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(model_loader, '_inference_db', None)
+    calls = []
+
+    def infer():
+        calls.append(1)
+        return np.arange(12, dtype=np.float32).reshape(1, 3, 4)
+
+    first = model_loader.infer_cached('s3://models/yolo.onnx', b'image-a', 640, infer)
+    second = model_loader.infer_cached('s3://models/yolo.onnx', b'image-a', 640, infer)
+    model_loader.infer_cached('s3://models/yolo.onnx', b'image-b', 640, infer)
+
+    assert len(calls) == 2
+    assert second.dtype == np.float32
+    np.testing.assert_array_equal(first, second)
+    model_loader._inference_db.close()
+
+
+@pytest.mark.parametrize('value,expected', [
+    (None, 256),
+    ('16', 16),
+    ('0', 1),
+    ('lots', 256),
+])
+def test_inference_cache_max_rows_from_env(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv('INFERENCE_CACHE_MAX_ROWS', raising=False)
+    else:
+        monkeypatch.setenv('INFERENCE_CACHE_MAX_ROWS', value)
+    assert model_loader._inference_cache_max_rows() == expected
@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+from shared.models import PhotoMetadata
+
+
+def test_dynamodb_item_round_trip_converts_only_numbers():
+    """Floats become Decimals on write and come back unchanged; input is not mutated."""
+    detections = [
+        {'bbox': [1, 2, 30, 40], 'confidence': 0.75, 'grid_coords': {'row': 1, 'col': 2}},
+        {'bbox': [5, 6, 7, 8], 'damage_type': 'hail', 'meta': {'scores': [0.5, 0.25]}},
+    ]
+    metadata = PhotoMetadata(
+        photo_id='p1',
+        timestamp='2024-01-01T00:00:00Z',
+        s3_key='photos/p1.jpg',
+        detections=detections,
+        single_agent_results={'damage_counts': {'hail': 2}, 'score': 0.5},
+    )
+
+    item = metadata.to_dynamodb_item()
+    assert item['detections'][0]['confidence'] == Decimal('0.75')
+    assert item['detections'][1]['meta']['scores'] == [Decimal('0.5'), Decimal('0.25')]
+    assert item['single_agent_results']['score'] == Decimal('0.5')
+    assert metadata.detections[0]['confidence'] == 0.75
+    assert metadata.model_dump()['detections'] == detections
+
+    restored = PhotoMetadata.from_dynamodb_item(item)
+    assert restored.detections == detections
+    assert restored.single_agent_results == {'damage_counts': {'hail': 2}, 'score': 0.5}
+    assert isinstance(restored.detections[0]['bbox'][0], int)
+    assert PhotoMetadata.from_dynamodb_item(item, validate=True) == restored
+    assert PhotoMetadata.from_dynamodb_items([item, item]) == [restored, restored]
@@ -0,0 +1,44 @@
+import io
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+from shared import s3
+
+
+@pytest.fixture(autouse=True)
+def fake_credentials(monkeypatch):
+    # Presigning is local; it only needs some credentials to sign with
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.delenv('AWS_SESSION_TOKEN', raising=False)
+
+
+def test_presigned_url_host_matches_default_client():
+    """The shared client config must not change the host the frontend signs against."""
+    url = s3._presign('get_object', 'test-bucket', 'photos/p1.jpg', None, 600, 'us-east-2')
+    default = boto3.client('s3', region_name='us-east-2').generate_presigned_url(
+        'get_object',
+        Params={'Bucket': 'test-bucket', 'Key': 'photos/p1.jpg'},
+        ExpiresIn=600,
+    )
+    assert urlsplit(url).netloc == urlsplit(default).netloc
+
+
+def test_download_image_returns_body_bytes():
+    client = boto3.client('s3', region_name='us-east-2')
+    payload = b'\xff\xd8image-bytes\xff\xd9'
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            'get_object',
+            {'Body': StreamingBody(io.BytesIO(payload), len(payload)), 'ContentLength': len(payload)},
+            {'Bucket': 'test-bucket', 'Key': 'photos/p1.jpg'},
+        )
+        stubber.add_client_error('get_object', service_error_code='NoSuchKey')
+        with patch.object(s3, 'get_s3_client', return_value=client):
+            assert s3.download_image('test-bucket', 'photos/p1.jpg') == payload
+            assert s3.download_image('test-bucket', 'photos/missing.jpg') is None
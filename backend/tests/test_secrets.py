@@ -0,0 +1,104 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from shared import secrets
+
+REGION = 'us-east-2'
+OPENAI = 'openai-api-key'
+OPENROUTER = 'openrouter-api-key'
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(secrets, '_secret_cache', {})
+    monkeypatch.setenv('REGION', REGION)
+    monkeypatch.delenv('OPENAI_SECRET_NAME', raising=False)
+    monkeypatch.delenv('OPENROUTER_SECRET_NAME', raising=False)
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+
+@pytest.fixture
+def stubber(monkeypatch):
+    """Stubbed Secrets Manager client; assert_no_pending_responses catches extra or missing calls"""
+    client = boto3.client('secretsmanager', region_name=REGION)
+    monkeypatch.setattr(secrets, 'get_secrets_client', lambda region='us-east-2': client)
+    with Stubber(client) as stub:
+        yield stub
+        stub.assert_no_pending_responses()
+
+
+def _secret_value(name, value):
+    return {'ARN': f'arn:aws:secretsmanager:{REGION}:123456789012:secret:{name}-AbCdEf', 'Name': name, 'SecretString': value}
+
+
+def test_get_secret_is_cached(stubber):
+    stubber.add_response('get_secret_value', _secret_value(OPENAI, '{"api_key": "sk-1"}'), {'SecretId': OPENAI})
+
+    assert secrets.get_secret(OPENAI, REGION) == 'sk-1'
+    # No second response is queued: a repeat call must come from the cache
+    assert secrets.get_secret(OPENAI, REGION) == 'sk-1'
+
+
+def test_get_secret_refetches_after_ttl(stubber, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(secrets.time, 'monotonic', lambda: clock[0])
+    stubber.add_response('get_secret_value', _secret_value(OPENAI, 'sk-old'), {'SecretId': OPENAI})
+    stubber.add_response('get_secret_value', _secret_value(OPENAI, 'sk-new'), {'SecretId': OPENAI})
+
+    assert secrets.get_secret(OPENAI, REGION) == 'sk-old'
+    clock[0] += secrets.SECRET_CACHE_TTL_SECONDS - 1
+    assert secrets.get_secret(OPENAI, REGION) == 'sk-old'
+    clock[0] += 1
+    assert secrets.get_secret(OPENAI, REGION) == 'sk-new'
+
+
+def test_failed_lookup_is_not_cached(stubber):
+    stubber.add_client_error('get_secret_value', service_error_code='ResourceNotFoundException')
+    stubber.add_response('get_secret_value', _secret_value(OPENAI, 'sk-1'), {'SecretId': OPENAI})
+
+    assert secrets.get_secret(OPENAI, REGION) is None
+    assert secrets.get_secret(OPENAI, REGION) == 'sk-1'
+
+
+def test_get_keys_uses_one_batch_call(stubber):
+    stubber.add_response(
+        'batch_get_secret_value',
+        {'SecretValues': [_secret_value(OPENROUTER, 'or-1'), _secret_value(OPENAI, 'sk-1')], 'Errors': []},
+        {'SecretIdList': [OPENAI, OPENROUTER]},
+    )
+
+    assert secrets.get_keys() == {'openai': 'sk-1', 'openrouter': 'or-1'}
+    # Both keys are cached now, so the per-key helpers make no further calls
+    assert secrets.get_openai_key() == 'sk-1'
+    assert secrets.get_openrouter_key() == 'or-1'
+
+
+def test_get_keys_falls_back_when_batch_is_denied(stubber):
+    stubber.add_client_error('batch_get_secret_value', service_error_code='AccessDeniedException')
+    stubber.add_response('get_secret_value', _secret_value(OPENAI, 'sk-1'), {'SecretId': OPENAI})
+    stubber.add_response('get_secret_value', _secret_value(OPENROUTER, 'or-1'), {'SecretId': OPENROUTER})
+
+    assert secrets.get_keys() == {'openai': 'sk-1', 'openrouter': 'or-1'}
+
+
+def test_get_keys_fetches_secrets_missing_from_batch(stubber):
+    stubber.add_response(
+        'batch_get_secret_value',
+        {
+            'SecretValues': [_secret_value(OPENAI, 'sk-1')],
+            'Errors': [{'SecretId': OPENROUTER, 'ErrorCode': 'ResourceNotFoundException', 'Message': 'missing'}],
+        },
+        {'SecretIdList': [OPENAI, OPENROUTER]},
+    )
+    stubber.add_client_error('get_secret_value', service_error_code='ResourceNotFoundException')
+
+    assert secrets.get_keys() == {'openai': 'sk-1', 'openrouter': None}
+
+
+def test_get_keys_skips_batch_when_one_key_is_cached(stubber):
+    secrets._secret_cache[(OPENAI, REGION)] = ('sk-1', secrets.time.monotonic())
+    stubber.add_response('get_secret_value', _secret_value(OPENROUTER, 'or-1'), {'SecretId': OPENROUTER})
+
+    assert secrets.get_keys() == {'openai': 'sk-1', 'openrouter': 'or-1'}
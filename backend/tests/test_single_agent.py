@@ -0,0 +1,169 @@
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from shared import model_loader, single_agent
+from shared.cv_utils import DecodedImage
+
+cv2 = single_agent.cv2
+
+
+def _reference_nms(boxes, scores, iou_threshold):
+    """Textbook greedy NMS, one pair at a time."""
+    keep = []
+    for i in sorted(range(len(scores)), key=lambda k: -scores[k]):
+        x1, y1, x2, y2 = boxes[i]
+        area = (x2 - x1) * (y2 - y1)
+        suppressed = False
+        for j in keep:
+            a1, b1, a2, b2 = boxes[j]
+            w = max(0.0, min(x2, a2) - max(x1, a1))
+            h = max(0.0, min(y2, b2) - max(y1, b1))
+            inter = w * h
+            union = max(area + (a2 - a1) * (b2 - b1) - inter, 1e-5)
+            if inter / union > iou_threshold:
+                suppressed = True
+                break
+        if not suppressed:
+            keep.append(i)
+    return keep
+
+
+def _clustered_boxes(seed, count=300):
+    """Boxes jittered around a few centres, so plenty of them overlap."""
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform(50, 590, size=(12, 2))
+    xy = centres[rng.integers(0, len(centres), count)] + rng.normal(0, 12, size=(count, 2))
+    wh = rng.uniform(8, 80, size=(count, 2))
+    boxes = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1).astype(np.float32)
+    # Distinct scores: tie order is not part of the contract
+    scores = rng.permutation(count).astype(np.float32) / count + np.float32(0.01)
+    return boxes, scores
+
+
+@pytest.mark.parametrize('path', ['opencv', 'numpy'])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_nms_paths_match_reference(monkeypatch, path, seed):
+    boxes, scores = _clustered_boxes(seed)
+    if path == 'numpy':
+        monkeypatch.setattr(single_agent, 'cv2', None)
+
+    expected = _reference_nms(boxes.astype(np.float64).tolist(), scores.tolist(), 0.45)
+    with patch.object(cv2.dnn, 'NMSBoxes', wraps=cv2.dnn.NMSBoxes) as nms_boxes:
+        keep = single_agent._nms(boxes, scores, 0.45)
+
+    assert nms_boxes.called == (path == 'opencv')
+    assert 0 < len(keep) < len(scores)
+    assert keep == expected
+
+
+ROOF_DIR = Path(__file__).resolve().parents[2] / 'test-data' / 'roofs'
+
+
+def _full_res_clean(mask):
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, single_agent._KERNEL_CLOSE)
+    return cv2.morphologyEx(mask, cv2.MORPH_OPEN, single_agent._KERNEL_OPEN)
+
+
+@pytest.mark.parametrize('filename', ['roof2.png', 'roof3.png'])
+def test_half_res_roof_cleanup_approximates_full_res(monkeypatch, filename):
+    """Masks past _MORPH_FULL_RES_MAX_EDGE are cleaned at half resolution; close, not exact."""
+    img = cv2.imread(str(ROOF_DIR / filename), cv2.IMREAD_COLOR)
+    assert max(img.shape[:2]) > single_agent._MORPH_FULL_RES_MAX_EDGE
+
+    # Capture the raw colour mask detect_roof_boundary hands to the cleanup
+    raw_masks = []
+    clean = single_agent._clean_roof_mask
+
+    def capture(mask):
+        raw_masks.append(mask.copy())
+        return clean(mask)
+
+    monkeypatch.setattr(single_agent, '_clean_roof_mask', capture)
+    single_agent.detect_roof_boundary(img)
+
+    raw = raw_masks[0]
+    half = clean(raw.copy()) > 0
+    full = _full_res_clean(raw.copy()) > 0
+    assert half.shape == full.shape == raw.shape
+    iou = np.logical_and(half, full).sum() / np.logical_or(half, full).sum()
+    assert iou >= 0.96
+
+
+def _reference_location_filter(detections, width, height, roof_mask, min_overlap=0.3):
+    """The original per-box filter: centre margins, then mean roof coverage of the box."""
+    top_cutoff = int(height * 0.12)
+    edge_margin = int(min(width, height) * 0.03)
+    kept = []
+    for det in detections:
+        x1, y1, x2, y2 = det['bbox']
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        if cy < top_cutoff or cx < edge_margin or cx > width - edge_margin or cy > height - edge_margin:
+            continue
+        ix1, iy1 = max(0, int(x1)), max(0, int(y1))
+        ix2, iy2 = min(width, int(x2)), min(height, int(y2))
+        if ix2 <= ix1 or iy2 <= iy1:
+            continue
+        if (roof_mask[iy1:iy2, ix1:ix2] > 0).mean() < min_overlap:
+            continue
+        kept.append(det)
+    return kept
+
+
+@pytest.mark.parametrize('count', [20, 400], ids=['per-box', 'integral'])
+def test_filter_detections_by_location_matches_per_box_mean(count):
+    width, height = 640, 480
+    rng = np.random.default_rng(count)
+    roof_mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.fillPoly(roof_mask, [np.array([[40, 470], [320, 90], [620, 470]], dtype=np.int32)], 255)
+
+    x1 = rng.uniform(-60, width, count)
+    y1 = rng.uniform(-60, height, count)
+    bboxes = np.stack([x1, y1, x1 + rng.uniform(1, 200, count), y1 + rng.uniform(1, 200, count)], axis=1)
+    detections = [{'bbox': bbox} for bbox in bboxes.tolist()]
+    # In-image, clipped at the right/bottom edges, and zero-area boxes
+    detections += [
+        {'bbox': [300.5, 300.2, 340.9, 330.7]},
+        {'bbox': [600, 400, 700, 520]},
+        {'bbox': [300, 300, 300, 340]},
+        {'bbox': [300, 300, 340, 300]},
+    ]
+
+    kept = single_agent.filter_detections_by_location(detections, width, height, roof_mask=roof_mask)
+    expected = _reference_location_filter(detections, width, height, roof_mask)
+    assert [id(det) for det in kept] == [id(det) for det in expected]
+    assert expected
+
+
+class _FakeSession:
+    """ONNX-shaped session that counts runs and returns an all-zero YOLOv8 output."""
+
+    def __init__(self):
+        self.runs = 0
+
+    def get_inputs(self):
+        return [SimpleNamespace(name='images', shape=[1, 3, 64, 64])]
+
+    def run(self, output_names, feeds):
+        self.runs += 1
+        return [np.zeros((1, 6, 84), dtype=np.float32)]
+
+
+def test_inference_cache_key_includes_decode_scale(tmp_path, monkeypatch):
+    """The same photo decoded at another CV_MAX_EDGE scale must not reuse cached output."""
+    monkeypatch.setenv('INFERENCE_CACHE_DB', str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(model_loader, '_inference_db', None)
+    session = _FakeSession()
+    bgr = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    for scale in (1, 1, 2):
+        single_agent.run_yolo_inference(
+            b'photo', session, filter_by_roof=False,
+            cache_key='s3://models/yolo.onnx', decoded=DecodedImage(bgr, scale=scale),
+        )
+
+    assert session.runs == 2
+    model_loader._inference_db.close()
@@ -1,50 +1,75 @@
 import json
-import os
-import sys
-import unittest
 from types import SimpleNamespace
 from unittest.mock import patch
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'single-agent-results'))
+import pytest
 
-from handler import handler  # type: ignore
+from shared import s3
 
+from tests._helpers import load_lambda_handler
 
-class TestSingleAgentResultsHandler(unittest.TestCase):
-    def setUp(self) -> None:
-        os.environ['DYNAMODB_TABLE_NAME'] = 'test-table'
-        os.environ['S3_BUCKET_NAME'] = 'test-bucket'
-        os.environ['REGION'] = 'us-east-2'
 
-    @patch('handler.generate_presigned_get_url')
-    @patch('handler.get_metadata')
-    def test_returns_single_agent_payload(self, mock_get_metadata, mock_presign) -> None:
-        mock_metadata = SimpleNamespace(
-            single_agent_results={'ai_summary': 'All good'},
-            single_agent_overlay_s3_key='single-agent/overlays/test.png',
-            single_agent_report_s3_key='single-agent/reports/test.json'
-        )
-        mock_get_metadata.return_value = mock_metadata
-        mock_presign.return_value = 'https://signed-url'
+single_agent_results_handler = load_lambda_handler('single-agent-results', 'single_agent_results_handler')
+handler = single_agent_results_handler.handler
 
-        event = {'pathParameters': {'photoId': 'abc123'}}
-        response = handler(event, None)
 
-        self.assertEqual(response['statusCode'], 200)
-        body = json.loads(response['body'])
-        self.assertEqual(body['photo_id'], 'abc123')
-        self.assertEqual(body['single_agent_results']['ai_summary'], 'All good')
-        self.assertEqual(body['single_agent_overlay_url'], 'https://signed-url')
-        self.assertEqual(body['single_agent_report_url'], 'https://signed-url')
+@pytest.fixture(autouse=True)
+def handler_env(monkeypatch) -> None:
+    monkeypatch.setenv('DYNAMODB_TABLE_NAME', 'test-table')
+    monkeypatch.setenv('S3_BUCKET_NAME', 'test-bucket')
+    monkeypatch.setenv('REGION', 'us-east-2')
 
-    @patch('handler.get_metadata')
-    def test_not_found_when_missing_results(self, mock_get_metadata) -> None:
-        mock_get_metadata.return_value = None
-        event = {'pathParameters': {'photoId': 'missing'}}
-        response = handler(event, None)
-        self.assertEqual(response['statusCode'], 404)
 
+@patch.object(single_agent_results_handler, 'generate_presigned_get_url')
+@patch.object(single_agent_results_handler, 'get_metadata')
+def test_returns_single_agent_payload(mock_get_metadata, mock_presign) -> None:
+    mock_metadata = SimpleNamespace(
+        single_agent_results={'ai_summary': 'All good'},
+        single_agent_overlay_s3_key='single-agent/overlays/test.png',
+        single_agent_report_s3_key='single-agent/reports/test.json'
+    )
+    mock_get_metadata.return_value = mock_metadata
+    mock_presign.return_value = 'https://signed-url'
 
-if __name__ == '__main__':
-    unittest.main()
+    event = {'pathParameters': {'photoId': 'abc123'}}
+    response = handler(event, None)
 
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert body['photo_id'] == 'abc123'
+    assert body['single_agent_results']['ai_summary'] == 'All good'
+    assert body['single_agent_overlay_url'] == 'https://signed-url'
+    assert body['single_agent_report_url'] == 'https://signed-url'
+
+
+@patch.object(single_agent_results_handler, 'get_metadata')
+def test_not_found_when_missing_results(mock_get_metadata) -> None:
+    mock_get_metadata.return_value = None
+    event = {'pathParameters': {'photoId': 'missing'}}
+    response = handler(event, None)
+    assert response['statusCode'] == 404
+
+
+@patch.object(single_agent_results_handler, 'get_metadata')
+def test_presigned_urls_reused_across_invocations(mock_get_metadata) -> None:
+    mock_get_metadata.return_value = SimpleNamespace(
+        single_agent_results={'ai_summary': 'All good'},
+        single_agent_overlay_s3_key='single-agent/overlays/test.png',
+        single_agent_report_s3_key='single-agent/reports/test.json'
+    )
+    s3._presign_in_window.cache_clear()
+    event = {'pathParameters': {'photoId': 'abc123'}}
+
+    # Pin the clock so both invocations land in the same reuse window
+    sign = lambda method, bucket, key, *_: f'https://signed/{key}'
+    with patch.object(s3, '_presign', side_effect=sign) as mock_sign, \
+            patch('shared.s3.time.time', return_value=1_700_000_000.0):
+        first = json.loads(handler(event, None)['body'])
+        second = json.loads(handler(event, None)['body'])
+    s3._presign_in_window.cache_clear()
+
+    # One signature per object key, none for the repeat request
+    assert mock_sign.call_count == 2
+    assert first == second
+    assert first['single_agent_overlay_url'] == 'https://signed/single-agent/overlays/test.png'
+    assert first['single_agent_report_url'] == 'https://signed/single-agent/reports/test.json'
@@ -152,6 +152,16 @@ export class ApiStack extends cdk.Stack {
     // Secrets Manager access
     secretsStack.openaiSecret.grantRead(sharedLambdaRole);
     secretsStack.openrouterSecret.grantRead(sharedLambdaRole);
+    // get_keys() fetches both API keys in one BatchGetSecretValue call. The
+    // action has no resource-level permissions, so it must be granted on '*';
+    // each secret in the batch is still checked against the GetSecretValue
+    // grants above
+    sharedLambdaRole.addToPrincipalPolicy(
+      new iam.PolicyStatement({
+        actions: ['secretsmanager:BatchGetSecretValue'],
+        resources: ['*'],
+      })
+    );
 
     // Photo Upload Lambda
     this.photoUploadFunction = new lambda.Function(this, 'PhotoUploadFunction', {
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Quantize the YOLO roof-damage ONNX model to int8 (static, QDQ format)
+
+Calibrates activations on a directory of roof photos, preprocessed exactly as
+run_yolo_inference does, then compares the int8 model against the float model
+on the same photos so the accuracy cost is visible before uploading.
+
+Usage:
+    python scripts/quantize-model.py yolov8s-roof.onnx yolov8s-roof-int8.onnx \\
+        --calibration-dir test-data/roofs
+
+Then upload the output next to the float model and point YOLO_MODEL_KEY at it:
+    aws s3 cp yolov8s-roof-int8.onnx s3://<bucket>/models/yolov8s-roof-int8.onnx
+
+Requires onnx and onnxruntime (dev machine only; the Lambda just loads the result).
+Dynamic quantization is not offered: on onnxruntime 1.16 it turns Conv into
+ConvInteger, which has no int8-weight CPU kernel and is slower than float.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+
+# Reuse the Lambda's letterbox so calibration sees production inputs
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'backend'))
+from shared.single_agent import _letterbox  # noqa: E402
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+
+def load_inputs(image_dir: Path, input_size: int) -> List[np.ndarray]:
+    """Letterbox and normalize every image in image_dir to a (1, 3, S, S) tensor."""
+    tensors = []
+    for path in sorted(image_dir.iterdir()):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"Skipping unreadable image: {path}")
+            continue
+        processed, _, _ = _letterbox(img, new_shape=input_size)
+        tensor = processed.transpose((2, 0, 1)).astype(np.float32, order='C')
+        tensor /= np.float32(255.0)
+        tensors.append(tensor[np.newaxis])
+    return tensors
+
+
+class RoofCalibrationReader(CalibrationDataReader):
+    """Feeds the calibration tensors to quantize_static one at a time."""
+
+    def __init__(self, input_name: str, tensors: List[np.ndarray]):
+        self._feeds = iter([{input_name: t} for t in tensors])
+
+    def get_next(self) -> Dict[str, np.ndarray]:
+        return next(self._feeds, None)
+
+
+def compare_models(float_path: str, int8_path: str, tensors: List[np.ndarray], conf_threshold: float) -> None:
+    """Print latency and per-anchor confidence agreement of the two models."""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    results = {}
+    for label, path in (('float32', float_path), ('int8', int8_path)):
+        session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        name = session.get_inputs()[0].name
+        session.run(None, {name: tensors[0]})  # warm-up
+        start = time.perf_counter()
+        outputs = [session.run(None, {name: t})[0] for t in tensors]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(tensors)
+        # YOLOv8 layout (1, 4 + classes, anchors): best class score per anchor
+        results[label] = [out[0, 4:].max(axis=0) for out in outputs]
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{label:>8}: {size_mb:6.1f} MB, {elapsed_ms:7.1f} ms/image")
+
+    max_diff = max(float(np.abs(a - b).max()) for a, b in zip(results['float32'], results['int8']))
+    agreement = np.mean([
+        np.mean((a >= conf_threshold) == (b >= conf_threshold))
+        for a, b in zip(results['float32'], results['int8'])
+    ])
+    kept_float = sum(int((a >= conf_threshold).sum()) for a in results['float32'])
+    kept_int8 = sum(int((b >= conf_threshold).sum()) for b in results['int8'])
+    print(f"Anchors >= {conf_threshold}: float32 {kept_float}, int8 {kept_int8}")
+    print(f"Threshold agreement: {agreement:.4f}, max confidence difference: {max_diff:.4f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('model', help='Float32 ONNX model')
+    parser.add_argument('output', help='Path for the int8 model')
+    parser.add_argument('--calibration-dir', type=Path, required=True,
+                        help='Directory of representative roof photos')
+    parser.add_argument('--conf-threshold', type=float, default=0.3,
+                        help='Confidence threshold used for the agreement report')
+    parser.add_argument('--per-tensor', action='store_true',
+                        help='Per-tensor weight scales instead of per-channel')
+    args = parser.parse_args()
+
+    session = ort.InferenceSession(args.model, providers=['CPUExecutionProvider'])
+    model_input = session.get_inputs()[0]
+    tensors = load_inputs(args.calibration_dir, int(model_input.shape[-1]))
+    if not tensors:
+        print(f"No calibration images found in {args.calibration_dir}")
+        return 1
+    print(f"Calibrating on {len(tensors)} images")
+
+    quantize_static(
+        args.model,
+        args.output,
+        RoofCalibrationReader(model_input.name, tensors),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=not args.per_tensor,
+    )
+    print(f"Wrote {args.output}")
+
+    compare_models(args.model, args.output, tensors, args.conf_threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -25,11 +25,11 @@ if (Test-Path "venv\Scripts\Activate.ps1") {
 # Install test dependencies
 Write-Host "Installing test dependencies..." -ForegroundColor Yellow
 pip install -q -r tests/requirements.txt
-pip install -q -r lambda/content-detection/requirements.txt
+pip install -q -r lambda/agent-single/requirements.txt
 
 # Run all tests
-Write-Host "Running unittest tests..." -ForegroundColor Yellow
-python -m unittest discover -s tests -p "test_*.py" -v
+Write-Host "Running pytest tests..." -ForegroundColor Yellow
+python -m pytest tests -v
 
 Write-Host ""
 Write-Host "Backend tests completed" -ForegroundColor Green
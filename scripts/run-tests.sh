@@ -30,11 +30,11 @@ source venv/bin/activate 2>/dev/null || source venv/Scripts/activate 2>/dev/null
 # Install test dependencies
 echo "Installing test dependencies..."
 pip install -q -r tests/requirements.txt
-pip install -q -r lambda/content-detection/requirements.txt
+pip install -q -r lambda/agent-single/requirements.txt
 
 # Run all tests
-echo "Running unittest tests..."
-python -m unittest discover -s tests -p "test_*.py" -v
+echo "Running pytest tests..."
+python -m pytest tests -v
 
 echo ""
 echo -e "${GREEN}✓ Backend tests completed${NC}"